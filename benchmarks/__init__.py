@@ -0,0 +1,2 @@
+from .layouts import syntheticLayout
+from .run import SCALES, compare, loadBaseline, runBenchmarks, saveBaseline, timeStages
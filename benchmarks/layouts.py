@@ -0,0 +1,58 @@
+import random
+
+from blueprint import Blueprint, Layout
+from blueprint.ShopObjects import Wall, attractionPoint
+
+
+def syntheticLayout(width=200, height=150, density=0.6, aisle=6, shelfDepth=3, shelfLength=24,
+                    points=8, seed=0, cellDimension=1.0):
+    """A seeded shop floor of width x height layout units: outer walls, rows of shelves
+    separated by aisles and cut by cross-aisles, attraction points in the aisles, an entrance
+    and an exit at the front
+
+    density is the share of shelf slots actually holding a shelf, so lower values open more
+    shortcuts. With cellDimension, the maze of the returned blueprint is already defined."""
+    rng = random.Random(seed)
+    walls = []
+
+    def addWall(x, y, w, h):
+        wall = Wall(x, y, w, h)
+        wall.setID('wall' + str(len(walls)))
+        walls.append(wall)
+
+    # outer walls, one unit thick
+    addWall(0, 0, width, 1)
+    addWall(0, height - 1, width, 1)
+    addWall(0, 0, 1, height)
+    addWall(width - 1, 0, 1, height)
+
+    # shelf rows from the back, keeping a front aisle free for the entrance and the exit
+    rows = []
+    y = 1 + aisle
+    while y + shelfDepth + 2 * aisle < height:
+        rows.append(y)
+        x = 1 + aisle
+        while x + shelfLength + aisle < width:
+            if rng.random() < density:
+                addWall(x, y, shelfLength, shelfDepth)
+            x += shelfLength + aisle
+        y += shelfDepth + aisle
+
+    attractionPoints = []
+    for k in range(points):
+        rowY = rng.choice(rows) if rows else 1
+        ap = attractionPoint(rng.uniform(1 + aisle, width - 1 - aisle), rowY - aisle / 2.0, aisle / 4.0)
+        ap.setID('AP' + str(k + 1))
+        attractionPoints.append(ap)
+
+    front = height - 1 - aisle / 2.0
+    entrances = {'entrata': {'id': 'entrata', 'cx': 1 + aisle / 2.0, 'cy': front}}
+    exits = {'uscita': {'id': 'uscita', 'cx': width - 1 - aisle / 2.0, 'cy': front}}
+
+    blueprint = Blueprint(0, 0, width, height)
+    blueprint.setTranslation(0.0, 0.0)
+    if cellDimension:
+        blueprint.setCellDimension(cellDimension)
+        blueprint.defineMaze(walls)
+
+    return Layout(blueprint, walls, attractionPoints, entrances, exits)
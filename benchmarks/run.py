@@ -0,0 +1,143 @@
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from blueprint import Blueprint, Fragrance, Walker, astar
+
+from .layouts import syntheticLayout
+
+# (width, height) in cells of a shop floor, with cellDimension 1
+SCALES = {
+    'small': (120, 90),
+    'medium': (240, 180),
+    'large': (480, 360),
+}
+
+STAGES = ('defineMaze', 'astar', 'Fragrance.createSniffingMap', 'Path.createSniffingMap', 'Walker.startWalking')
+
+
+def best(f, repeat):
+    # best wall-clock time of repeat calls, the least noisy estimate of the cost of f
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def timeStages(layout, repeat=3, walkers=4, seed=0):
+    """Seconds taken by every stage on layout, best of repeat, as {stage: seconds}
+
+    Paths run from the entrance to the exit; walkers visit every attraction point, then leave."""
+    bp = layout.blueprint
+    points = layout.points()
+    start = bp.transformPoint(points['entrata']['cx'], points['entrata']['cy'])
+    end = bp.transformPoint(points['uscita']['cx'], points['uscita']['cy'])
+    results = {}
+
+    def defineMaze():
+        bp.initMaze()
+        bp.defineMaze(layout.walls)
+
+    results['defineMaze'] = best(defineMaze, repeat)
+    results['astar'] = best(lambda: astar(bp.maze, start, end), repeat)
+
+    fragrance = Fragrance(end, bp.maze, init=False)
+
+    def fragranceMap():
+        fragrance.sniffingMap = np.array(bp.maze, dtype=float)
+        fragrance.createSniffingMap()
+
+    results['Fragrance.createSniffingMap'] = best(fragranceMap, repeat)
+
+    path = bp.newPath(points['entrata'], points['uscita'])
+    path.path = astar(bp.maze, start, end)
+    results['Path.createSniffingMap'] = best(lambda: path.createSniffingMap(bp.maze), repeat)
+
+    with redirect_stdout(io.StringIO()):
+        bp.calcFragrances(points)
+    itinerary = [bp.fragrances[ap.id] for ap in layout.attractionPoints] + [bp.fragrances['uscita']]
+
+    def walk():
+        for k in range(walkers):
+            walker = Walker(start, itinerary, 'w' + str(k), rng=seed + k)
+            with redirect_stdout(io.StringIO()):
+                walker.startWalking()
+
+    results['Walker.startWalking'] = best(walk, repeat)
+    return results
+
+
+def runBenchmarks(scales=None, repeat=3, seed=0):
+    """Times every stage at every scale on a seeded synthetic layout, as {scale: {stage: seconds}}"""
+    results = {}
+    for scale in scales or SCALES:
+        width, height = SCALES[scale]
+        layout = syntheticLayout(width, height, seed=seed)
+        results[scale] = timeStages(layout, repeat, seed=seed)
+    return results
+
+
+def saveBaseline(results, filename):
+    baseline = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'precision': Blueprint.precision,
+        'results': results,
+    }
+    with open(filename, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def loadBaseline(filename):
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def compare(results, baseline, tolerance=1.5):
+    """Stages slower than tolerance times their baseline, as (scale, stage, baseline, now) tuples"""
+    regressions = []
+    for scale, stages in results.items():
+        for stage, seconds in stages.items():
+            reference = baseline.get(scale, {}).get(stage)
+            if reference is not None and seconds > tolerance * reference:
+                regressions.append((scale, stage, reference, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Times the hot paths of the simulator on synthetic layouts')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='JSON baseline to check the results against')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.scales, args.repeat, args.seed)
+    for scale, stages in results.items():
+        for stage in STAGES:
+            print('%-8s %-28s %9.4f s' % (scale, stage, stages[stage]))
+
+    if args.save:
+        saveBaseline(results, args.save)
+
+    if args.compare:
+        regressions = compare(results, loadBaseline(args.compare), args.tolerance)
+        for scale, stage, reference, seconds in regressions:
+            print('REGRESSION %s %s: %.4f s -> %.4f s' % (scale, stage, reference, seconds))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
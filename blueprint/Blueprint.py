@@ -1,22 +1,40 @@
+from . import profiling
 from .astar import astar
-import matplotlib.pyplot as plt
 import math
 import numpy as np
 
-import scipy as sp
-import scipy.ndimage
-
-from shapely.geometry import Point
+from .grid import isFree, multiSourceWavefront, repairWavefront, walkableAdjacency, wavefront
+from .pathcache import PathCache
+from .policy import DX, DY, stepPolicy
+from .raster import cellCentres, rasterizeWalls, wallCells
+from .ShopObjects import attractionPoint
+from .tiles import TiledGrid
 from .Walker import Walker
+from .WalkerBatch import WalkerBatch
+
+# dtypes of the maze, of the fragrance distance fields and of the path sniffing maps for every
+# Blueprint.precision; None picks the smallest integer type holding the distances of the grid
+PRECISIONS = {
+    'double': (np.float64, np.float64, np.float64),
+    'single': (np.int8, np.int32, np.float32),
+    'compact': (np.int8, None, np.float16),
+}
 
 
 class Blueprint:
-    paths = {}
-    fragrances = {}
-    walkers = {}
     width = 300
     height = 300
     cellDimension = 15
+    rasterMode = 'vectorized'
+    precision = 'double'
+    storage = 'dense'
+    tileSize = 64
+    fragranceBatch = 16
+    pathMode = 'astar'
+    clusterSize = 16
+    exactPaths = False
+    pathBudget = None
+    pathSpill = None
 
     def __init__(self, x1, y1, x2, y2):
         self.x1 = x1
@@ -25,6 +43,11 @@ class Blueprint:
         self.y2 = y2
         self.width = self.x2 - self.x1
         self.height = self.y2 - self.y1
+        self.walls = []
+        self.index = None
+        self.seedSequence = np.random.SeedSequence()
+        self.pathCache = None
+        self.reset()
 
     def setTranslation(self, x, y):
         self.xTranslation = x
@@ -39,15 +62,45 @@ class Blueprint:
         mazeX = math.floor(self.width / self.cellDimension)
         mazeY = math.floor(self.height / self.cellDimension)
 
-        self.maze = np.zeros([mazeX, mazeY])
-        self.empty()
+        self.maze = np.zeros([mazeX, mazeY], dtype=self.dtypes((mazeX, mazeY))[0])
+        self.walls = []
+        self.index = None
+        self.reset()
+
+    def dtypes(self, shape=None):
+        """Returns the (maze, distance, map) dtypes of the precision policy for a grid of shape"""
+        mazeDtype, distanceDtype, mapDtype = PRECISIONS[self.precision]
+        if distanceDtype is None:
+            if shape is None:
+                shape = self.maze.shape
+            distanceDtype = np.int16 if shape[0] * shape[1] <= np.iinfo(np.int16).max else np.int32
+        return np.dtype(mazeDtype), np.dtype(distanceDtype), np.dtype(mapDtype)
+
+    @profiling.profiled('Blueprint.defineMaze')
+    def defineMaze(self, walls, mode=None):
+        if not mode:
+            mode = self.rasterMode
+
+        self.adjacency = None
+        self.hierarchy = None
+        self.routeFragrances = {}
+        self.forgetPaths()
+        self.walls.extend(walls)
+        if self.index is not None:
+            for wall in walls:
+                self.index.addWall(wall)
+
+        if mode == 'vectorized':
+            rasterizeWalls(self.maze, walls, self.cellDimension, self.xTranslation, self.yTranslation)
+            return
+
+        import shapely.geometry
 
-    def defineMaze(self, walls):
         for i, row in enumerate(self.maze):
             for j, column in enumerate(row):
                 px = (i + 1) * self.cellDimension - (self.cellDimension) / 2
                 py = (j + 1) * self.cellDimension - (self.cellDimension) / 2
-                pCheck = Point(px - self.xTranslation, py - self.yTranslation)
+                pCheck = shapely.geometry.Point(px - self.xTranslation, py - self.yTranslation)
 
                 for wall in walls:
                     if pCheck.within(wall.poly):
@@ -55,18 +108,209 @@ class Blueprint:
                         break
 
 
+    def addWall(self, wall):
+        return self.updateWalls(add=[wall])
+
+    def removeWall(self, wall):
+        return self.updateWalls(remove=[wall])
+
+    def moveWall(self, wall, dx, dy):
+        """Translates wall by (dx, dy) in layout coordinates"""
+        index = self.getIndex()
+        cells = index.cellsCovered(wall)
+        self.walls.remove(wall)
+        index.removeWall(wall)
+        for corner in (wall.topLeft, wall.topRight, wall.bottomLeft, wall.bottomRight):
+            corner['x'] += dx
+            corner['y'] += dy
+        wall.initPolygonObject()
+        return self.updateWalls(add=[wall], cells=cells)
+
+    def getIndex(self):
+        """Returns the SpatialIndex of the walls, set to the grid of the maze"""
+        if self.index is None:
+            from .spatial import SpatialIndex
+            self.index = SpatialIndex(self.walls)
+        self.index.setGrid(self.maze.shape, self.cellDimension, self.xTranslation, self.yTranslation)
+        return self.index
+
+    @profiling.profiled('Blueprint.updateWalls')
+    def updateWalls(self, add=(), remove=(), cells=None):
+        """Adds and removes walls without starting over: only the cells they cover are rasterized
+        again, fragrances are repaired around the cells that changed, paths whose route runs
+        next to them, or that freed cells may shorten or reach within their smoothing, are routed
+        again and the sniffing maps of the others are corrected by the smoothed difference.
+        cells are further (i, j) arrays to rasterize again.
+
+        Any other cell keeps its value, so walls drawn in the maze but missing from walls, as in
+        a blueprint loaded from BlueprintCache without its walls, are never erased by an edit.
+
+        Returns the (i, j) arrays of the cells that switched between wall and free."""
+        index = self.getIndex()
+        candidates = [] if cells is None else [cells]
+        for wall in remove:
+            self.walls.remove(wall)
+            index.removeWall(wall)
+            candidates.append(index.cellsCovered(wall))
+        for wall in add:
+            self.walls.append(wall)
+            index.addWall(wall)
+            candidates.append(index.cellsCovered(wall))
+
+        i = np.concatenate([np.empty(0, dtype=np.intp)] + [c[0] for c in candidates])
+        j = np.concatenate([np.empty(0, dtype=np.intp)] + [c[1] for c in candidates])
+        if not len(i):
+            return i, j
+
+        # rasterize the walls again over the window of the candidate cells, writing only to those
+        x0, x1, y0, y1 = i.min(), i.max() + 1, j.min(), j.max() + 1
+        xCentres = cellCentres(self.maze.shape[0], self.cellDimension, self.xTranslation)[x0:x1]
+        yCentres = cellCentres(self.maze.shape[1], self.cellDimension, self.yTranslation)[y0:y1]
+        covered = np.zeros((x1 - x0, y1 - y0), dtype=bool)
+        for wall in index.wallsIn(xCentres[0], yCentres[0], xCentres[-1], yCentres[-1]):
+            covered[wallCells(wall, xCentres, yCentres)] = True
+
+        window = np.array(self.maze[x0:x1, y0:y1])
+        window[i - x0, j - y0] = np.where(covered[i - x0, j - y0], -1, 0)
+
+        ci, cj = np.nonzero(window != self.maze[x0:x1, y0:y1])
+        changed = (ci + x0, cj + y0)
+        if not len(ci):
+            return changed
+
+        if not self.maze.flags.writeable:
+            self.maze = np.array(self.maze)
+        self.maze[x0:x1, y0:y1] = window
+        self.adjacency = None
+        self.hierarchy = None
+
+        if self.fragranceStack is not None and not self.fragranceStack.flags.writeable:
+            fragrances = [self.fragrances[idFrag] for idFrag in self.fragranceIDs]
+            self.setFragranceStack(self.fragranceIDs, [f.location for f in fragrances], np.array(self.fragranceStack),
+                                   [f.radius for f in fragrances])
+
+        repaired = set()
+        for f in list(self.fragrances.values()) + list(self.routeFragrances.values()):
+            if id(f) not in repaired:
+                f.repair(self.maze, changed)
+                repaired.add(id(f))
+
+        self.repairPaths(changed)
+        return changed
+
+    def repairPaths(self, changed):
+        import scipy.ndimage
+
+        # paths resolved on demand are simply resolved again
+        self.forgetPaths()
+
+        near = np.zeros(self.maze.shape, dtype=bool)
+        near[changed] = True
+        near = scipy.ndimage.binary_dilation(near, np.ones((3, 3), dtype=bool))
+        wasWall = self.maze[changed] == 0
+        freedX, freedY = changed[0][wasWall], changed[1][wasWall]
+
+        rerouted = []
+        for p in self.paths.values():
+            route = np.array(p.path) if p.path else None
+            if route is None or near[route[:, 0], route[:, 1]].any():
+                rerouted.append(p)
+            elif len(freedX):
+                rx, ry = int(4 * p.sigmaX + 0.5), int(4 * p.sigmaY + 0.5)
+                # a freed cell may open a shorter route, which takes at least the larger of the
+                # offsets on each side of it in moves, or lie within the smoothing of this one
+                bound = np.maximum(abs(freedX - p.start[0]), abs(freedY - p.start[1])) + \
+                    np.maximum(abs(freedX - p.end[0]), abs(freedY - p.end[1]))
+                if bound.min() < len(route) - 1 or ((abs(freedX[:, np.newaxis] - route[:, 0]) <= rx) &
+                                                    (abs(freedY[:, np.newaxis] - route[:, 1]) <= ry)).any():
+                    rerouted.append(p)
+
+        self.findRoutes(rerouted)
+        for p in rerouted:
+            p.createSniffingMap(self.maze)
+            p.sniffingMap = self.storeMap(p.sniffingMap.astype(self.dtypes()[2], copy=False))
+
+        # the sniffing map is linear in the maze: the others only need the smoothed difference
+        rerouted = set(rerouted)
+        for p in self.paths.values():
+            if p in rerouted:
+                continue
+            rx = int(4 * p.sigmaX + 0.5)
+            ry = int(4 * p.sigmaY + 0.5)
+            x0, x1 = max(changed[0].min() - rx, 0), min(changed[0].max() + rx + 1, self.maze.shape[0])
+            y0, y1 = max(changed[1].min() - ry, 0), min(changed[1].max() + ry + 1, self.maze.shape[1])
+
+            delta = np.zeros((x1 - x0, y1 - y0))
+            delta[changed[0] - x0, changed[1] - y0] = np.where(wasWall, -1.0, 1.0) * p.preGradientF
+            sniffingMap = np.array(p.sniffingMap)
+            sniffingMap[x0:x1, y0:y1] += scipy.ndimage.gaussian_filter(delta, [p.sigmaX, p.sigmaY], mode=p.mode)
+            p.sniffingMap = self.storeMap(sniffingMap)
+
     def transformPoint(self,cx,cy):
         newCX = int((cx+self.xTranslation) / self.cellDimension)
         newCY = int((cy+self.yTranslation) / self.cellDimension)
         return (newCX,newCY)
 
+    @profiling.profiled('Blueprint.calcFragrance')
     def calcFragrance(self,start,idFrag=None):
+        radius = self.arrivalRadius(start)
         start = self.transformPoint(start['cx'],start['cy'])
-        frag = Fragrance(start, self.maze,idFrag)
+        frag = Fragrance(start, self.maze,idFrag,dtype=self.dtypes()[1],radius=radius)
+        if self.storage == 'tiled':
+            frag.toTiles(self.tileSize)
 
         self.fragrances[idFrag] = frag
 
-    def calcPath(self, start, end, id=None):
+    def arrivalRadius(self, point):
+        """Radius in cells within which a walker reaches point: the radius of its attraction point,
+        or Fragrance.arrivalRadius for any other point, such as an entrance whose object is the
+        SVG element it was read from"""
+        ap = point.get('object')
+        if isinstance(ap, attractionPoint) and ap.r > 0:
+            return ap.r / self.cellDimension
+        return Fragrance.arrivalRadius
+
+    def getAdjacency(self):
+        if self.adjacency is None:
+            self.adjacency = walkableAdjacency(self.maze == 0)
+        return self.adjacency
+
+    def getHierarchy(self):
+        if self.hierarchy is None:
+            from .hpa import HierarchicalGraph
+            self.hierarchy = HierarchicalGraph(self.maze, self.clusterSize)
+        return self.hierarchy
+
+    @profiling.profiled('Blueprint.calcFragrances')
+    def calcFragrances(self, points):
+        ids = list(points.keys())
+        locations = [self.transformPoint(points[i]['cx'], points[i]['cy']) for i in ids]
+        radii = [self.arrivalRadius(points[i]) for i in ids]
+
+        if self.storage == 'tiled':
+            # a few dense layers at a time, so that the whole stack never exists
+            self.fragranceStack = None
+            self.fragranceIDs = ids
+            for i in range(0, len(ids), self.fragranceBatch):
+                stack = fragranceStack(self.maze, locations[i:i + self.fragranceBatch], self.getAdjacency(),
+                                       self.dtypes()[1])
+                for k, layer in enumerate(stack):
+                    frag = Fragrance(locations[i + k], layer, ids[i + k], init=False, copy=False, radius=radii[i + k])
+                    self.fragrances[ids[i + k]] = frag.toTiles(self.tileSize)
+            return
+
+        stack = fragranceStack(self.maze, locations, self.getAdjacency(), self.dtypes()[1])
+        self.setFragranceStack(ids, locations, stack, radii)
+
+    def setFragranceStack(self, ids, locations, stack, radii=None):
+        self.fragranceStack = stack
+        self.fragranceIDs = list(ids)
+        if radii is None:
+            radii = [None] * len(self.fragranceIDs)
+        for k, (idFrag, location, radius) in enumerate(zip(ids, locations, radii)):
+            self.fragrances[idFrag] = Fragrance(location, stack[k], idFrag, init=False, copy=False, radius=radius)
+
+    def newPath(self, start, end, id=None):
         start = self.transformPoint(start['cx'],start['cy'])
         end   = self.transformPoint(end['cx'],end['cy'])
 
@@ -74,12 +318,126 @@ class Blueprint:
         x_sigma = int(self.width / self.cellDimension)
         y_sigma = int(self.height / self.cellDimension)
         p.calcSigma(x_sigma, y_sigma)
-        p.findBestPath(self.maze)
+        return p
+
+    @profiling.profiled('Blueprint.calcPath')
+    def calcPath(self, start, end, id=None, mode=None):
+        p = self.newPath(start, end, id)
+        self.findRoutes([p], mode)
         p.createSniffingMap(self.maze)
+        p.sniffingMap = self.storeMap(p.sniffingMap.astype(self.dtypes()[2], copy=False))
 
         self.paths[p.id] = p
 
-    def addWalker(self,start,pathIDs,walkerID=None):
+    @profiling.profiled('Blueprint.getPath')
+    def getPath(self, start, end, id=None, mode=None):
+        """Returns the Path from start to end like calcPath, but only computed on first request
+        and then kept in pathCache, within pathBudget bytes of sniffing maps, least recently used
+        first out, spilling to the pathSpill directory when set
+
+        The route is searched once per pair of points: the reverse request follows it backwards.
+        The sniffing map grows toward the end, so each direction smooths a map of its own."""
+        p = self.newPath(start, end, id)
+        key = (p.start, p.end)
+        cache = self.getPathCache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        pair = (min(key), max(key))
+        if pair in self.routes:
+            route = self.routes[pair]
+            p.path = route if route is None or pair == key else route[::-1]
+        else:
+            self.findRoutes([p], mode)
+            self.routes[pair] = p.path if p.path is None or pair == key else p.path[::-1]
+
+        p.createSniffingMap(self.maze)
+        p.sniffingMap = self.storeMap(p.sniffingMap.astype(self.dtypes()[2], copy=False))
+        cache.put(key, p)
+        return p
+
+    def getPathCache(self):
+        """Returns pathCache, built on first use and kept in line with the current pathBudget
+        and pathSpill"""
+        if self.pathCache is None:
+            self.pathCache = PathCache(self.pathBudget, self.pathSpill, self.storeMap)
+        elif (self.pathCache.budget, self.pathCache.directory) != (self.pathBudget, self.pathSpill):
+            self.pathCache.configure(self.pathBudget, self.pathSpill)
+        return self.pathCache
+
+    def forgetPaths(self):
+        """Drops the paths resolved by getPath, and their spilled maps"""
+        if self.pathCache is not None:
+            self.pathCache.clear()
+        self.pathCache = None
+        self.routes = {}
+
+    @profiling.profiled('Blueprint.calcPaths')
+    def calcPaths(self, pairs, dtype=None, mode=None):
+        """Like calcPath for every (start, end, id) in pairs, but all sniffing maps are built
+        and smoothed at once in a (len(pairs), X, Y) stack, of the precision map dtype by default
+
+        The routes are found as by findRoutes."""
+        paths = [self.newPath(start, end, id) for start, end, id in pairs]
+        self.findRoutes(paths, mode)
+
+        stack = sniffingMapStack(self.maze, paths, dtype or self.dtypes()[2])
+        for k, p in enumerate(paths):
+            p.sniffingMap = self.storeMap(stack[k])
+            self.paths[p.id] = p
+
+    @profiling.profiled('Blueprint.findRoutes')
+    def findRoutes(self, paths, mode=None):
+        """Finds the best path of every Path according to mode, pathMode by default:
+        'astar' searches every path on its own; 'hierarchical' uses a HierarchicalGraph of the maze,
+        built once and kept until the maze changes, and exactPaths makes it match astar;
+        'fragrance' climbs the fragrance of every end, diffused once per end cell"""
+        if not mode:
+            mode = self.pathMode
+
+        if mode == 'hierarchical':
+            routes = self.getHierarchy().findPaths([(p.start, p.end) for p in paths], self.exactPaths)
+            for p, route in zip(paths, routes):
+                p.path = route
+        elif mode == 'fragrance':
+            # no fragrance can be diffused from a wall or from off the grid: such routes are None
+            fragrances = self.getRouteFragrances([p.end for p in paths if isFree(self.maze, p.end)])
+            for p in paths:
+                p.path = fragrances[p.end].routeFrom(p.start, self.maze) if p.end in fragrances else None
+        else:
+            for p in paths:
+                p.findBestPath(self.maze)
+
+    def getRouteFragrances(self, locations):
+        """Returns {cell: Fragrance} covering locations, memoized until the maze changes
+
+        Fragrances already calculated on a cell are reused; the missing ones are diffused
+        together, fragranceBatch at a time."""
+        for f in self.fragrances.values():
+            self.routeFragrances.setdefault(tuple(f.location), f)
+
+        missing = [l for l in dict.fromkeys(locations) if l not in self.routeFragrances]
+        for i in range(0, len(missing), self.fragranceBatch):
+            batch = missing[i:i + self.fragranceBatch]
+            stack = fragranceStack(self.maze, batch, self.getAdjacency(), self.dtypes()[1])
+            for location, layer in zip(batch, stack):
+                frag = Fragrance(location, layer, init=False, copy=False)
+                self.routeFragrances[location] = frag.toTiles(self.tileSize) if self.storage == 'tiled' else frag
+
+        return self.routeFragrances
+
+    def storeMap(self, a, fill=0):
+        """Returns a map as the storage of the blueprint keeps it: as is, or as a TiledGrid"""
+        if self.storage == 'tiled':
+            return TiledGrid.fromDense(a, self.tileSize, fill)
+        return a
+
+    def setSeed(self, seed):
+        """Seeds the walkers added from now on, each with its own stream spawned from seed"""
+        self.seedSequence = np.random.SeedSequence(seed)
+
+    def addWalker(self,start,pathIDs,walkerID=None,sink=None,rng=None):
         if not walkerID:
             walkerID = 'walker-'+str(len(self.walkers)+1)
 
@@ -87,83 +445,76 @@ class Blueprint:
 
         fragrances = [self.fragrances[fID] for fID in pathIDs]
 
-        self.walkers[walkerID] = Walker(start,fragrances,walkerID)
-
-    def empty(self):
-        self.fragrances = {}
-        self.paths = {}
-        self.walkers = {}
-
-
-
-def plotMaze(maze,displayVal=False):
-    figure = plt.figure(figsize=[15, 15], dpi=90)
-
-    plt.imshow(np.rot90(maze), cmap='plasma', interpolation='nearest')
-    plt.xlabel("$x$")
-    plt.ylabel("$y$")
-    plt.gca().invert_yaxis()
-
-    if displayVal:
-        for (j, i), label in np.ndenumerate(np.rot90(maze)):
-            plt.gca().text(i, j, int(label), ha='center', va='center')
-
-    plt.show()
-
-def plotSniffingMapPath(maze, path,title=None):
-    preGrad = np.rot90(path.getPreGradientMap(maze))
-
-    fig, ax = plt.subplots(1,2, figsize=[15, 15], dpi=90)
+        if rng is None:
+            rng = self.seedSequence.spawn(1)[0]
 
-    plt.sca(ax[0])
+        self.walkers[walkerID] = Walker(start,fragrances,walkerID,sink,len(self.walkers),rng)
 
-    # Plot preGrad
-    plt.imshow(preGrad, cmap='plasma', interpolation='nearest')
-    plt.xlabel("$x$")
-    plt.ylabel("$y$")
-    plt.gca().invert_yaxis()
+    @profiling.profiled('Blueprint.simulateWalkers')
+    def simulateWalkers(self, starts, itineraries, seed=None, sink=None):
+        starts = [self.transformPoint(start['cx'], start['cy']) for start in starts]
 
-    plt.sca(ax[1])
+        ids = list(dict.fromkeys(fID for pathIDs in itineraries for fID in pathIDs))
+        index = {fID: k for k, fID in enumerate(ids)}
+        itineraries = [[index[fID] for fID in pathIDs] for pathIDs in itineraries]
 
-    # Plot sniffing map
-    plt.imshow(np.rot90(path.sniffingMap), cmap='plasma', interpolation='nearest')
-    plt.xlabel("$x$")
-    plt.ylabel("$y$")
-    plt.title("$\sigma_x = " + str(path.sigmaX) + "\quad \sigma_y = " + str(path.sigmaY) + "$")
-    plt.gca().invert_yaxis()
+        batch = WalkerBatch(starts, itineraries, [self.fragrances[fID] for fID in ids], seed=seed)
+        if sink is not None:
+            batch.stream(sink)
+            return None
 
-    if not title:
-        title = path.id
+        return batch.startWalking()
 
-    fig.suptitle(title, fontsize=16, y=0.72)
+    def reset(self):
+        """Drops everything computed on the maze: adjacency, fragrances, paths and walkers.
+        All of it lives on the instance, so blueprints never share simulation state"""
+        self.adjacency = None
+        self.hierarchy = None
+        self.routeFragrances = {}
+        self.fragranceStack = None
+        self.fragranceIDs = []
+        self.fragrances = {}
+        self.paths = {}
+        self.forgetPaths()
+        self.walkers = {}
 
-    plt.show()
+    def empty(self):
+        self.reset()
 
-def plotWalkerPathway(maze,walker,title=None):
-    a = np.copy(maze)
 
-    for i, (x, y) in enumerate(walker.pathway):
-        a[x][y] = walker.pathway[i]*i
 
-    figure = plt.figure(figsize=[15, 15], dpi=90)
+@profiling.profiled('fragranceStack')
+def fragranceStack(maze, locations, adjacency=None, dtype=float):
+    """Returns the normalized fragrance maps of all locations as one (n_points, X, Y) array,
+    computed with a single wavefront pass"""
+    steps = multiSourceWavefront(maze == 0, locations, adjacency)
+    stack = np.repeat(maze[np.newaxis].astype(dtype), len(locations), axis=0)
+    reached = steps > 0
+    stack[reached] = maze.size - steps[reached]
+    if profiling.active is not None:
+        profiling.count('fragrance.cells', int(np.count_nonzero(reached)))
 
-    plt.imshow(np.rot90(a), cmap='plasma', interpolation='nearest')
-    plt.xlabel("$x$")
-    plt.ylabel("$y$")
-    plt.gca().invert_yaxis()
+    for k, location in enumerate(locations):
+        Fragrance(location, stack[k], init=False, copy=False).normalizeSniffingMap()
 
-    plt.show()
+    return stack
 
 
 class Fragrance:
+    __slots__ = ('location', 'sniffingMap', 'maxDistance', 'policy', 'id', 'radius', 'arrival')
 
-    maxDistance = 999
     mapWall     = -1
+    bfsMode     = 'wavefront'
+    arrivalRadius = 5
+    minArrivalRadius = 1.5
 
-    def __init__(self, location, maze, id=None, init=True):
+    def __init__(self, location, maze, id=None, init=True, copy=True, dtype=float, radius=None):
         self.location = location
-        self.sniffingMap = np.copy(maze)
+        self.sniffingMap = np.array(maze, dtype=dtype) if copy else maze
         self.maxDistance = maze.shape[0]*maze.shape[1]
+        self.policy = None
+        self.radius = self.arrivalRadius if radius is None else radius
+        self.arrival = None
 
         if id:
             self.id = id
@@ -173,7 +524,165 @@ class Fragrance:
         if init:
             self.createSniffingMap()
 
-    def createSniffingMap(self):
+    @profiling.profiled('Fragrance.createSniffingMap')
+    def createSniffingMap(self, mode=None):
+        if not mode:
+            mode = self.bfsMode
+
+        if mode == 'wavefront':
+            self.expandWavefront()
+        else:
+            self.expandCellByCell()
+
+        self.normalizeSniffingMap()
+
+    def normalizeSniffingMap(self):
+        # normalize non-wall from 1 to minDistance+1
+        self.sniffingMap[self.sniffingMap>0]-=np.amin(self.sniffingMap[self.sniffingMap>self.mapWall])+1
+        self.policy = None
+        self.arrival = None
+
+    def levels(self, free):
+        """Returns the wavefront steps behind the sniffing map, 0 at the location and -1 where it
+        was not reached, given the free cells it was diffused on"""
+        smell = np.asarray(self.sniffingMap).astype(np.int64)
+        x, y = self.location
+        around = smell[max(x - 1, 0):x + 2, max(y - 1, 0):y + 2][free[max(x - 1, 0):x + 2, max(y - 1, 0):y + 2]]
+        levels = np.full(smell.shape, -1, dtype=np.int64)
+        if not len(around):
+            levels[x, y] = 0
+            return levels
+
+        # the neighbours of the location are one step away; normalizeSniffingMap only shifted the
+        # distances, by maxDistance when some free cell was never reached
+        top = around.max() + 1
+        reached = free & (smell > 0) if top == self.maxDistance - 1 else free
+        levels[reached] = top - smell[reached]
+        levels[x, y] = 0
+        return levels
+
+    def setLevels(self, levels, free):
+        """Writes wavefront steps back as a normalized sniffing map, as createSniffingMap would"""
+        x, y = self.location
+        smell = np.where(levels > 0, self.maxDistance - levels, np.where(free, 0, self.mapWall))
+        smell[x, y] = self.maxDistance - 2 if (levels[max(x - 1, 0):x + 2, max(y - 1, 0):y + 2] == 1).any() else 0
+        smell[smell > 0] -= np.amin(smell[smell > self.mapWall]) + 1
+        self.setSniffingMap(smell)
+
+    def setSniffingMap(self, smell):
+        # in place, so that a map viewing the fragrance stack stays a view
+        if isinstance(self.sniffingMap, TiledGrid):
+            self.sniffingMap = TiledGrid.fromDense(np.asarray(smell, dtype=self.sniffingMap.dtype),
+                                                   self.sniffingMap.tile, self.mapWall)
+        elif not self.sniffingMap.flags.writeable:
+            self.sniffingMap = np.array(smell, dtype=self.sniffingMap.dtype)
+        else:
+            self.sniffingMap[...] = smell
+        self.policy = None
+        self.arrival = None
+
+    def repair(self, maze, cells):
+        """Updates the sniffing map after the (i, j) cells of the maze switched between wall and
+        free, searching again only where the distance to the location changes"""
+        free = maze == 0
+        location = tuple(self.location)
+
+        if not free[location] or ((cells[0] == location[0]) & (cells[1] == location[1])).any():
+            self.setSniffingMap(Fragrance(location, maze, dtype=self.sniffingMap.dtype).sniffingMap)
+            return
+
+        wasFree = free.copy()
+        wasFree[cells] = ~free[cells]
+
+        levels = self.levels(wasFree)
+        repairWavefront(levels, free, cells)
+        self.setLevels(levels, free)
+
+    def toTiles(self, tile=64):
+        """Stores the sniffing map as a TiledGrid, where blocks of walls cost nothing"""
+        if not isinstance(self.sniffingMap, TiledGrid):
+            self.sniffingMap = TiledGrid.fromDense(self.sniffingMap, tile, self.mapWall)
+            self.policy = None
+            self.arrival = None
+        return self
+
+    def getPolicy(self):
+        if self.policy is None:
+            self.policy = stepPolicy(self.sniffingMap)
+        return self.policy
+
+    def getArrival(self):
+        """Returns (x0, y0, window), where the True cells of window, placed at (x0, y0), are those
+        where a walker has arrived: closer than radius to the location both in a straight line
+        and walking around the walls, as read from the sniffing map. The radius is never less
+        than minArrivalRadius, since walkers climb to the neighbours of the location, not onto it"""
+        if self.arrival is None:
+            radius = max(self.radius, self.minArrivalRadius)
+            reach = int(math.ceil(radius)) - 1
+            x, y = self.location
+            x0, x1 = max(x - reach, 0), min(x + reach + 1, self.sniffingMap.shape[0])
+            y0, y1 = max(y - reach, 0), min(y + reach + 1, self.sniffingMap.shape[1])
+
+            if isinstance(self.sniffingMap, TiledGrid):
+                smell = self.sniffingMap.region(x0, x1, y0, y1)
+            else:
+                smell = np.asarray(self.sniffingMap[x0:x1, y0:y1])
+            smell = smell.astype(np.int64)
+
+            dx = np.arange(x0, x1)[:, np.newaxis] - x
+            dy = np.arange(y0, y1)[np.newaxis, :] - y
+            window = dx * dx + dy * dy < radius * radius
+
+            # the neighbours of the location are one step away, as in levels
+            around = smell[max(x - 1, x0) - x0:x + 2 - x0, max(y - 1, y0) - y0:y + 2 - y0]
+            around = around[around > 0]
+            if len(around):
+                window &= (smell > 0) & (around.max() + 1 - smell < radius)
+            else:
+                window[...] = False
+            window[x - x0, y - y0] = True
+            self.arrival = (x0, y0, window)
+        return self.arrival
+
+    def routeFrom(self, start, maze=None):
+        """Path from start to the location, stepping each time to the best smelling neighbour
+        of the step policy: a shortest path in moves, found without any search. None when the
+        smell stops growing before the location, i.e. when start cannot reach it, and, as with
+        astar, when either end is off the grid or on a wall of maze"""
+        x, y = start
+        endX, endY = self.location
+        rows, cols = self.sniffingMap.shape
+        if not (0 <= x < rows and 0 <= y < cols and 0 <= endX < rows and 0 <= endY < cols):
+            return None
+        if maze is not None and not (isFree(maze, start) and isFree(maze, self.location)):
+            return None
+
+        directions, counts = self.getPolicy()
+
+        # the location itself is only marked on the way back, so the climb ends next to it
+        path = [(x, y)]
+        while max(abs(x - endX), abs(y - endY)) > 1:
+            if counts[x, y] == 0:
+                return None
+            d = directions[x, y][0]
+            nextX, nextY = x + int(DX[d]), y + int(DY[d])
+            if not self.sniffingMap[nextX, nextY] > self.sniffingMap[x, y]:
+                return None
+            x, y = nextX, nextY
+            path.append((x, y))
+
+        if (x, y) != (endX, endY):
+            path.append((endX, endY))
+        return path
+
+    def expandWavefront(self):
+        steps = wavefront(self.sniffingMap == 0, self.location)
+        reached = steps > 0
+        self.sniffingMap[reached] = self.maxDistance - steps[reached]
+        if profiling.active is not None:
+            profiling.count('fragrance.cells', int(np.count_nonzero(reached)))
+
+    def expandCellByCell(self):
         distance = 0
 
         toEvaluate = [self.location]
@@ -191,17 +700,6 @@ class Fragrance:
             toEvaluate = np.copy(toEvaluateNext)
             distance += 1
 
-
-        # be sure that is float
-        self.sniffingMap = self.sniffingMap.astype(float)
-
-        # normalize non-wall from 1 to minDistance+1
-        self.sniffingMap[self.sniffingMap>0]-=np.amin(self.sniffingMap[self.sniffingMap>self.mapWall])+1
-
-
-
-
-
     def evalNeighbours(self, position, distance):
 
         evaluated = []
@@ -253,23 +751,64 @@ class Path:
     def setPathGradFunction(self, f):
         self.gradPathF = f
 
+    @profiling.profiled('Path.findBestPath')
     def findBestPath(self, maze):
         print("\t" + self.id + ": finding best path...")
-        maze /= maze.max()
         self.path = astar(maze, self.start, self.end)
-        self.createSniffingMap(maze, False)
 
     def getPreGradientMap(self, maze, toNormalize=True):
-        a = np.copy(maze)
         if toNormalize:
-            a /= maze.max()
+            # walls weigh 1 whatever value the maze marks them with
+            a = (maze != 0).astype(float)
+        else:
+            a = np.array(maze, dtype=float)
         a *= self.preGradientF
-        for i, (x, y) in enumerate(self.path):
+        for i, (x, y) in enumerate(self.path or []):
             a[x][y] = self.gradPathF(i)
 
         return a
 
+    @profiling.profiled('Path.createSniffingMap')
     def createSniffingMap(self, maze, toNormalize=True):
+        import scipy.ndimage
+
         mazePathMap = self.getPreGradientMap(maze, toNormalize)
-        self.sniffingMap = sp.ndimage.filters \
-            .gaussian_filter(mazePathMap, [self.sigmaX, self.sigmaY], mode=self.mode)
\ No newline at end of file
+        self.sniffingMap = scipy.ndimage.gaussian_filter(mazePathMap, [self.sigmaX, self.sigmaY], mode=self.mode)
+
+
+@profiling.profiled('sniffingMapStack')
+def sniffingMapStack(maze, paths, dtype=float):
+    """Sniffing maps of paths whose best path is already found, as a (len(paths), X, Y) array
+
+    The pre-gradient maps are painted with a single fancy-indexed assignment and every group
+    of paths sharing sigmas and mode is smoothed in one gaussian_filter call, with sigma 0
+    along the stack axis."""
+    import scipy.ndimage
+
+    walls = (maze != 0)
+    stack = np.empty((len(paths),) + maze.shape, dtype=float)
+    stack[...] = walls
+    stack *= np.array([p.preGradientF for p in paths], dtype=float).reshape(-1, 1, 1)
+
+    routes = [(k, np.asarray(p.path, dtype=np.intp).reshape(-1, 2), p) for k, p in enumerate(paths) if p.path]
+    if routes:
+        layer = np.concatenate([np.full(len(r), k) for k, r, p in routes])
+        cells = np.concatenate([r for k, r, p in routes])
+        # one call per cell, as getPreGradientMap does: gradient functions may only take scalars
+        values = np.concatenate([np.fromiter(map(p.gradPathF, range(len(r))), float, len(r))
+                                 for k, r, p in routes])
+        stack[layer, cells[:, 0], cells[:, 1]] = values
+
+    # ndimage filters cannot write float16, which is then only used to store the result
+    dtype = np.dtype(dtype)
+    out = np.empty(stack.shape, dtype=dtype if dtype.itemsize >= 4 else np.float32)
+    groups = {}
+    for k, p in enumerate(paths):
+        groups.setdefault((p.sigmaX, p.sigmaY, p.mode), []).append(k)
+    for (sigmaX, sigmaY, mode), layers in groups.items():
+        if len(layers) == len(paths):
+            scipy.ndimage.gaussian_filter(stack, [0, sigmaX, sigmaY], mode=mode, output=out)
+        else:
+            out[layers] = scipy.ndimage.gaussian_filter(stack[layers], [0, sigmaX, sigmaY], mode=mode, output=out.dtype)
+
+    return out.astype(dtype, copy=False)
\ No newline at end of file
@@ -1,5 +1,3 @@
-from shapely.geometry import Point, Polygon
-
 class Wall:
     def __init__(self, x, y, width, height, matrix=False, scale=False):
         self.id = 'no_id'
@@ -19,11 +17,20 @@ class Wall:
         return str(self.__dict__)
 
     def initPolygonObject(self):
-        coords = [(self.topLeft['x'], self.topLeft['y']),
-                  (self.topRight['x'], self.topRight['y']),
-                  (self.bottomRight['x'], self.bottomRight['y']),
-                  (self.bottomLeft['x'], self.bottomLeft['y'])]
-        self.poly = Polygon(coords)  # shapely Object
+        # the shapely Polygon is only built on first use of poly, and again after every change
+        self._poly = None
+
+    @property
+    def poly(self):
+        if self._poly is None:
+            from shapely.geometry import Polygon
+
+            coords = [(self.topLeft['x'], self.topLeft['y']),
+                      (self.topRight['x'], self.topRight['y']),
+                      (self.bottomRight['x'], self.bottomRight['y']),
+                      (self.bottomLeft['x'], self.bottomLeft['y'])]
+            self._poly = Polygon(coords)  # shapely Object
+        return self._poly
 
     def setID(self, idWall):
         self.id = idWall
@@ -82,8 +89,15 @@ class attractionPoint:
         self.cy = y
         self.r = r
         self.id = 'no_id'
+        self._p = None
+
+    @property
+    def p(self):
+        if self._p is None:
+            from shapely.geometry import Point
 
-        self.p = Point(x, y)  # shapely Object
+            self._p = Point(self.cx, self.cy)  # shapely Object
+        return self._p
 
     def __str__(self):
         return str(self.__dict__)
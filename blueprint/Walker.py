@@ -1,7 +1,9 @@
-import random
-from shapely.geometry.point import Point
+from bisect import bisect_right
+
 import numpy as np
 
+from . import profiling
+from .trajectory import trajectoryChunk
 
 def probDistr(n, predictability=0.45):
     arr = []
@@ -13,33 +15,111 @@ def probDistr(n, predictability=0.45):
     return [float(i) / sum(arr) for i in arr]
 
 
+def spawnGenerators(seed, n):
+    """Returns n independent Generators, one per walker, from the streams of SeedSequence(seed)"""
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(n)]
+
+
 class Walker:
-    pathway = []
-    steps = 0
+    """A walker sniffing its way through paths, one fragrance after the other
+
+    Every random number comes from rng, a numpy Generator or a seed for one, drawn bufferSize
+    uniforms at a time: a seeded walker always walks the same pathway. predictability, maxSteps
+    and usePolicy default to the class attributes and can be set per walker, as arguments or
+    attributes; only such walkers get an instance __dict__."""
+
+    __slots__ = ('id', 'start', 'end', 'paths', 'sink', 'index', 'rng', 'cdf', 'uniforms', 'cursor',
+                 'currentPosition', 'currentPath', 'currentI', 'pathway', 'steps', '__dict__')
+
     predictability = 0.05
-    currentPath = None
-    currentI    = 1
     maxSteps = 10000
+    usePolicy = True
+    chunkSize = 4096
+    bufferSize = 1024
 
-    def __init__(self, start, paths, name):
+    def __init__(self, start, paths, name, sink=None, index=0, rng=None, predictability=None, maxSteps=None,
+                 usePolicy=None):
         self.id = name
-        self.currentPosition = start
         self.start = start
         self.end = paths[-1].location
         self.paths = paths
+
+        # with a sink, pathway only buffers the positions not handed over yet
+        self.sink = sink
+        self.index = index
+
+        if predictability is not None:
+            self.predictability = predictability
+        if maxSteps is not None:
+            self.maxSteps = maxSteps
+        if usePolicy is not None:
+            self.usePolicy = usePolicy
+
+        self.rng = np.random.default_rng(rng)
+        self.cdf = np.cumsum(probDistr(8, self.predictability)).tolist()
+        self.uniforms = []
+        self.cursor = 0
+        self.reset()
+
+    def reset(self):
+        """Puts the walker back on its start, forgetting the pathway walked so far"""
+        self.currentPosition = self.start
+        self.currentPath = None
+        self.currentI = 1
         self.pathway = []
+        self.steps = 0
 
+    @profiling.profiled('Walker.startWalking')
     def startWalking(self):
+        # predictability may have been set on the walker since it was made
+        self.cdf = np.cumsum(probDistr(8, self.predictability)).tolist()
         for path in self.paths:
             self.updatePosition()
             self.currentPath = path
             self.followSniffingPath()
             self.currentI+=1
 
+        if self.sink is not None:
+            self.flush()
+
+    def flush(self):
+        if not self.pathway:
+            return
+
+        xs, ys = zip(*self.pathway)
+        step = np.arange(self.steps, self.steps + len(xs))
+        self.sink(trajectoryChunk(self.index, step, xs, ys))
+
+        self.steps += len(xs)
+        self.pathway = []
+
+    def random(self):
+        """Returns the next uniform in [0, 1) of the buffer, drawing a new block when it runs out"""
+        if self.cursor == len(self.uniforms):
+            self.uniforms = self.rng.random(self.bufferSize).tolist()
+            self.cursor = 0
+        self.cursor += 1
+        return self.uniforms[self.cursor - 1]
+
+    def drawNeighbours(self):
+        # how many of the best neighbours to consider, 1 to 8, following probDistr
+        return bisect_right(self.cdf, self.random()) + 1
+
     def getRandomDirection(self, path=None):
         if not path:
             path = self.currentPath
 
+        x, y = self.currentPosition
+        shape = path.sniffingMap.shape
+        if self.usePolicy and hasattr(path, 'getPolicy') and 0 <= x < shape[0] and 0 <= y < shape[1]:
+            # the ranked neighbours of every cell are precompiled once per fragrance
+            directions, counts = path.getPolicy()
+            n = self.drawNeighbours()
+            possibleDirections = directions[x, y][:min(n, counts[x, y])]
+            selectedDirection = int(possibleDirections[int(self.random() * len(possibleDirections))])
+
+            return (selectedDirection // 3, selectedDirection % 3)
+
         # get points around the current pos
         a = np.ones((3, 3)) * -1
         for i, r in enumerate(a):
@@ -51,12 +131,12 @@ class Walker:
                     toMapY = 1 - i + self.currentPosition[1]
                     if toMapX <0 or toMapY<0:
                         continue
-                    a[i][j] = path.sniffingMap[toMapX][toMapY]
+                    a[i][j] = path.sniffingMap[toMapX, toMapY]
                 except IndexError:
                     a[i][j] = -10
 
         # get the random direction based on the predicibility
-        n = np.random.choice(np.arange(1, 9), p=probDistr(8, self.predictability))
+        n = self.drawNeighbours()
         largest = a.flatten().argsort()[-n:][::-1]
 
         iNeg = len(largest)
@@ -69,7 +149,7 @@ class Walker:
                 break
 
         possibleDirections = largest[:iNeg]  # avoid negative numbers
-        selectedDirection = possibleDirections[random.randint(0, len(possibleDirections) - 1)]
+        selectedDirection = possibleDirections[int(self.random() * len(possibleDirections))]
 
         return (int(selectedDirection / 3), selectedDirection % 3)
 
@@ -78,25 +158,37 @@ class Walker:
                                 self.currentPosition[1] + 1 - direction[0])
         self.pathway.append(self.currentPosition)
 
+        if self.sink is not None and len(self.pathway) >= self.chunkSize:
+            self.flush()
+
 
 
 
     def followSniffingPath(self):
+        x0, y0, window = self.currentPath.getArrival()
+        width, height = window.shape
         i = 0
         while True:
 
-            arrived = Point(self.currentPosition[0], self.currentPosition[1]) \
-                .within(Point(self.currentPath.location[0], self.currentPath.location[1]).buffer(5.0))
+            x = self.currentPosition[0] - x0
+            y = self.currentPosition[1] - y0
+            arrived = 0 <= x < width and 0 <= y < height and window[x, y]
 
             if arrived:
                 if self.currentI >= len(self.paths):
                     break
-                if random.random()*100 > 80:
+                if self.random()*100 > 80:
                     break
 
             if i > self.maxSteps:
                 print("reached max step for a walker")
+                profiling.count('walker.maxSteps')
                 break
             direction = (self.getRandomDirection())
             self.updatePosition(direction)
             i += 1
+
+        # one arrival check per step, plus the one ending the leg
+        if profiling.active is not None:
+            profiling.count('walker.steps', i)
+            profiling.count('walker.arrivalChecks', i + 1)
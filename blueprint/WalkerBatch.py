@@ -0,0 +1,179 @@
+import numpy as np
+
+from . import profiling
+from .policy import CENTRE, DX, DY
+from .tiles import TiledGrid, TiledStack
+from .trajectory import readPathways, trajectoryChunk
+from .Walker import Walker, probDistr
+
+def stackPolicies(fragrances, directions=None, counts=None):
+    """Stacks the step policies of the fragrances, optionally into the given arrays
+
+    Tiled fragrances are stacked as TiledStacks, unless arrays are given to copy them into"""
+    if directions is None and any(isinstance(f.sniffingMap, TiledGrid) for f in fragrances):
+        policies = [f.getPolicy() for f in fragrances]
+        return TiledStack([d for d, c in policies]), TiledStack([c for d, c in policies])
+
+    shape = fragrances[0].sniffingMap.shape if fragrances else (0, 0)
+    if directions is None:
+        directions = np.empty((len(fragrances),) + shape + (8,), dtype=np.int8)
+    if counts is None:
+        counts = np.empty((len(fragrances),) + shape, dtype=np.int8)
+
+    for k, f in enumerate(fragrances):
+        directions[k], counts[k] = f.getPolicy()
+
+    return directions, counts
+
+
+def stackArrivals(fragrances):
+    """Stacks the arrival windows of the fragrances as (origins, windows): the (x0, y0) of every
+    window, and the windows themselves padded with False to the same size"""
+    arrivals = [f.getArrival() for f in fragrances]
+    size = max([max(w.shape) for x0, y0, w in arrivals], default=0)
+
+    origins = np.array([(x0, y0) for x0, y0, w in arrivals], dtype=np.int64).reshape(-1, 2)
+    windows = np.zeros((len(arrivals), size, size), dtype=bool)
+    for k, (x0, y0, w) in enumerate(arrivals):
+        windows[k, :w.shape[0], :w.shape[1]] = w
+    return origins, windows
+
+
+class WalkerBatch:
+    """Advances many walkers together on NumPy arrays
+
+    Every walker follows the same stochastic rule as Walker: at each step it draws how many
+    of the best-smelling neighbours to consider, drops the negative ones and picks one of the
+    rest uniformly, through the precompiled step policy of each fragrance. starts are positions
+    on the grid, itineraries lists of indices into fragrances, seed a seed or a numpy Generator.
+    policies and arrivals can hand over the stackPolicies(fragrances) and stackArrivals(fragrances)
+    arrays when they are already built or shared, in which case fragrances is not needed."""
+
+    def __init__(self, starts, itineraries, fragrances=None, predictability=None, maxSteps=None, seed=None,
+                 policies=None, arrivals=None, firstWalker=0):
+        self.predictability = Walker.predictability if predictability is None else predictability
+        self.maxSteps = Walker.maxSteps if maxSteps is None else maxSteps
+        self.rng = np.random.default_rng(seed)
+
+        starts = np.asarray(starts, dtype=np.int64).reshape(-1, 2)
+        self.n = len(starts)
+        self.firstWalker = firstWalker
+        self.x = starts[:, 0].copy()
+        self.y = starts[:, 1].copy()
+
+        self.lengths = np.array([len(i) for i in itineraries], dtype=np.int64)
+        self.itineraries = np.zeros((self.n, max(self.lengths, default=0)), dtype=np.int64)
+        for w, itinerary in enumerate(itineraries):
+            self.itineraries[w, :len(itinerary)] = itinerary
+
+        self.origins, self.windows = stackArrivals(fragrances) if arrivals is None else arrivals
+        self.directions, self.counts = stackPolicies(fragrances) if policies is None else policies
+
+        self.cdf = np.cumsum(probDistr(8, self.predictability))
+        self.maxStepsReached = 0
+        self.pathways = None
+
+    def getRandomDirections(self, w, targets):
+        x = self.x[w]
+        y = self.y[w]
+
+        n = np.searchsorted(self.cdf, self.rng.random(len(w)), side='right') + 1
+        valid = np.minimum(n, self.counts[targets, x, y])
+
+        choice = (self.rng.random(len(w)) * valid).astype(np.int64)
+        direction = self.directions[targets, x, y, choice].astype(np.int64)
+
+        # a walker with no usable neighbour stays where it is
+        direction[valid == 0] = CENTRE
+        return direction
+
+    @profiling.profiled('WalkerBatch.startWalking')
+    def startWalking(self):
+        """Walks every walker to the end of its itinerary and returns all pathways at once"""
+        pathways = readPathways(self.iterWalking())
+        self.pathways = [pathways.get(self.firstWalker + w, np.empty((0, 2), dtype=np.int64))
+                         for w in range(self.n)]
+        return self.pathways
+
+    @profiling.profiled('WalkerBatch.stream')
+    def stream(self, sink, chunkSize=65536):
+        """Walks every walker, handing the trajectory chunks to sink instead of keeping them"""
+        for chunk in self.iterWalking(chunkSize):
+            sink(chunk)
+
+    def iterWalking(self, chunkSize=65536):
+        """Walks every walker, yielding trajectory chunks of about chunkSize rows as they fill up"""
+        leg = np.zeros(self.n, dtype=np.int64)
+        steps = np.zeros(self.n, dtype=np.int64)
+        recorded = np.zeros(self.n, dtype=np.int64)
+        active = self.lengths > 0
+
+        buffer = []
+        buffered = 0
+        checks = 0
+        moves = 0
+
+        def record(w):
+            nonlocal buffered
+            buffer.append(trajectoryChunk(self.firstWalker + w, recorded[w], self.x[w], self.y[w]))
+            recorded[w] += 1
+            buffered += len(w)
+
+        def flush():
+            nonlocal buffered
+            chunk = np.concatenate(buffer)
+            buffer.clear()
+            buffered = 0
+            return chunk
+
+        record(np.flatnonzero(active))
+
+        while active.any():
+            # end the legs of the arrived or exhausted walkers, possibly several times in a row
+            pending = np.flatnonzero(active)
+            while len(pending):
+                checks += len(pending)
+                targets = self.itineraries[pending, leg[pending]]
+                x = self.x[pending] - self.origins[targets, 0]
+                y = self.y[pending] - self.origins[targets, 1]
+                size = self.windows.shape[1]
+                inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+                arrived = np.zeros(len(pending), dtype=bool)
+                arrived[inside] = self.windows[targets[inside], x[inside], y[inside]]
+
+                lastLeg = leg[pending] + 1 >= self.lengths[pending]
+                leaving = arrived & (lastLeg | (self.rng.random(len(pending)) * 100 > 80))
+                exhausted = ~leaving & (steps[pending] > self.maxSteps)
+                self.maxStepsReached += int(exhausted.sum())
+
+                ended = pending[leaving | exhausted]
+                leg[ended] += 1
+                steps[ended] = 0
+                active[ended] = leg[ended] < self.lengths[ended]
+
+                pending = ended[active[ended]]
+                record(pending)
+
+            movers = np.flatnonzero(active)
+            if not len(movers):
+                break
+
+            direction = self.getRandomDirections(movers, self.itineraries[movers, leg[movers]])
+            self.x[movers] += DX[direction]
+            self.y[movers] += DY[direction]
+            steps[movers] += 1
+            moves += len(movers)
+            record(movers)
+
+            if buffered >= chunkSize:
+                yield flush()
+
+        if buffered:
+            yield flush()
+
+        profiling.count('walker.steps', moves)
+        profiling.count('walker.arrivalChecks', checks)
+        profiling.count('walker.maxSteps', self.maxStepsReached)
+
+        if self.maxStepsReached:
+            print("reached max step for " + str(self.maxStepsReached) + " walker legs")
@@ -1,6 +1,41 @@
 from .astar import astar
 from .Blueprint import *
-from .figures import *
 from .intersections import *
 from .ShopObjects import *
-from .Walker import *
\ No newline at end of file
+from .Walker import *
+from .WalkerBatch import *
+from .parallel import ParallelRunner
+from .trajectory import NpyChunkWriter, readChunks, readPathways
+from .occupancy import OccupancyAccumulator
+from .loader import Layout, loadSVG
+from .cache import BlueprintCache
+from .pathcache import PathCache
+from .profiling import Profile, profile
+
+# plotting, and everything built on scipy or shapely, is imported on first access only, so that
+# a simulation worker importing the package starts with NumPy alone
+LAZY = {
+    'HierarchicalGraph': 'hpa',
+    'SpatialIndex': 'spatial',
+    'plotMaze': 'plotting',
+    'plotSniffingMapPath': 'plotting',
+    'plotWalkerPathway': 'plotting',
+}
+LAZY.update(dict.fromkeys(['GM', 'W', 'H', 'SIZE', 'BLUE', 'GRAY', 'DARKGRAY', 'YELLOW', 'GREEN', 'RED', 'BLACK',
+                           'COLOR_ISVALID', 'plot_line', 'plot_coords', 'color_isvalid', 'color_issimple',
+                           'plot_line_isvalid', 'plot_line_issimple', 'plot_bounds', 'add_origin', 'set_limits'],
+                          'figures'))
+
+
+def __getattr__(name):
+    if name not in LAZY:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+
+    import importlib
+    value = getattr(importlib.import_module('.' + LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY))
@@ -1,112 +1,120 @@
+import heapq
 import math
 
-class Node():
-    """A node class for A* Pathfinding"""
+import numpy as np
 
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
+if __package__:
+    from . import profiling
+else:
+    # run as a script, e.g. python blueprint/astar.py: profiling.py is found next to this file
+    import profiling
 
-        self.g = 0
-        self.h = 0
-        self.f = 0
+SQRT2 = math.sqrt(2)
 
-    def __eq__(self, other):
-        return self.position == other.position
+# Adjacent squares as (dx, dy, diagonal)
+NEIGHBOURS = [(0, -1, False), (0, 1, False), (-1, 0, False), (1, 0, False),
+              (-1, -1, True), (-1, 1, True), (1, -1, True), (1, 1, True)]
 
 
-def astar(maze, start, end):
-    """Returns a list of tuples as a path from the given start to the given end in the given maze"""
+def euclidean(dx, dy):
+    return math.sqrt(dx * dx + dy * dy)
 
-    # Create start and end node
-    start_node = Node(None, start)
-    start_node.g = start_node.h = start_node.f = 0
-    end_node = Node(None, end)
-    end_node.g = end_node.h = end_node.f = 0
 
-    # Initialize both open and closed list
-    open_list = []
-    closed_list = []
+def octile(dx, dy):
+    if dx < dy:
+        dx, dy = dy, dx
+    return dx + (SQRT2 - 1) * dy
 
-    # Add the start node
-    open_list.append(start_node)
 
-    # Loop until you find the end
-    while len(open_list) > 0:
+def countExpanded(closed):
+    if profiling.active is not None:
+        profiling.count('astar.calls')
+        profiling.count('astar.expanded', closed.count(1))
 
-        # Get the current node
-        current_node = open_list[0]
-        current_index = 0
-        for index, item in enumerate(open_list):
-            if item.f < current_node.f:
-                current_node = item
-                current_index = index
 
-        # Pop current off open list, add to closed list
-        open_list.pop(current_index)
+@profiling.profiled('astar')
+def astar(maze, start, end, heuristic='euclidean'):
+    """Returns a list of tuples as a path from the given start to the given end in the given maze
 
-        not_add = False
-        for closed_node in closed_list:
-            if current_node == closed_node:
-                not_add = True
-                break
+    Any non-zero cell is a wall. Every move costs 1 with the default euclidean heuristic;
+    with heuristic='octile' diagonal moves cost sqrt(2), which keeps the heuristic
+    consistent and the returned path shortest in octile distance."""
 
-        if not_add:
-            continue
+    grid = np.asarray(maze)
+    rows, cols = grid.shape
+
+    if not (0 <= start[0] < rows and 0 <= start[1] < cols) or \
+            not (0 <= end[0] < rows and 0 <= end[1] < cols):
+        return None
+
+    if heuristic == 'octile':
+        h = octile
+        diagonalCost = SQRT2
+    elif heuristic == 'euclidean':
+        h = euclidean
+        diagonalCost = 1
+    else:
+        raise ValueError("unknown heuristic '" + str(heuristic) + "'")
+
+    # flat grid state: walls, best g-score, closed bitmap and parent of every cell
+    walls = (grid != 0).ravel().tolist()
+    g = [math.inf] * (rows * cols)
+    closed = bytearray(rows * cols)
+    parent = [-1] * (rows * cols)
+
+    endX, endY = end
+    startIndex = start[0] * cols + start[1]
+    endIndex = endX * cols + endY
+
+    g[startIndex] = 0
+    hStart = h(abs(start[0] - endX), abs(start[1] - endY))
+    open_heap = [(hStart, hStart, startIndex)]
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
 
-        closed_list.append(current_node)
+        if closed[current]:
+            continue
+        closed[current] = 1
 
         # Found the goal
-        if current_node == end_node:
+        if current == endIndex:
+            countExpanded(closed)
             path = []
-            current = current_node
-            while current is not None:
-                path.append(current.position)
-                current = current.parent
-            return path[::-1] # Return reversed path
+            while current != -1:
+                path.append(divmod(current, cols))
+                current = parent[current]
+            return path[::-1]
 
-        # Generate children
-        children = []
-        for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)]: # Adjacent squares
+        x, y = divmod(current, cols)
+        currentG = g[current]
 
-            # Get node position
-            node_position = (current_node.position[0] + new_position[0], current_node.position[1] + new_position[1])
+        for dx, dy, diagonal in NEIGHBOURS:
+            nx = x + dx
+            ny = y + dy
 
             # Make sure within range
-            if node_position[0] > (len(maze) - 1) or node_position[0] < 0 or node_position[1] > (len(maze[len(maze)-1]) -1) or node_position[1] < 0:
-                continue
-
-            # Make sure walkable terrain
-            if maze[node_position[0]][node_position[1]] != 0:
+            if nx < 0 or nx >= rows or ny < 0 or ny >= cols:
                 continue
 
-            # Create new node
-            new_node = Node(current_node, node_position)
-
-            # Append
-            children.append(new_node)
+            child = nx * cols + ny
 
+            # Make sure walkable terrain and not already expanded
+            if walls[child] or closed[child]:
+                continue
 
-        # Loop through children
-        for child in children:
-
-            # Child is on the closed list
-            for closed_child in closed_list:
-                if child == closed_child:
-                    continue
+            childG = currentG + (diagonalCost if diagonal else 1)
+            if childG >= g[child]:
+                continue
 
-            # Create the f, g, and h values
-            child.g = current_node.g + 1
-            child.h = math.sqrt(((child.position[0] - end_node.position[0]) ** 2) + ((child.position[1] - end_node.position[1]) ** 2))
-            child.f = child.g + child.h
+            g[child] = childG
+            parent[child] = current
+            childH = h(abs(nx - endX), abs(ny - endY))
+            heapq.heappush(open_heap, (childG + childH, childH, child))
 
-            # Child is already in the open list
-            for open_node in open_list:
-                if child == open_node and child.g > open_node.g:
-                    continue
+    countExpanded(closed)
 
-            # Add the child to the open list
-            open_list.append(child)
+    return None
 
 
 def main():
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import json
+import marshal
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .Blueprint import Blueprint, Fragrance, Path
+from .loader import Layout, loadSVG
+from .ShopObjects import Wall, attractionPoint
+
+# bump whenever the stored layout or the way any map is computed changes
+CACHE_VERSION = 3
+
+
+def gradientKey(f):
+    # the bytecode and constants of a Python function, or the name of any other callable
+    code = getattr(f, '__code__', None)
+    if code is None:
+        return repr(getattr(f, '__qualname__', f)).encode()
+    return marshal.dumps(code)
+
+
+class BlueprintCache:
+    """Persistent store of compiled blueprints: maze, fragrances and paths
+
+    Entries are keyed by a hash of the SVG content, the cell dimension, whether paths were
+    compiled and the settings of the maps: precision, routing, with the cluster size and long
+    runs of hierarchical routes, the arrival radii of the fragrances and the Path sigma
+    parameters and gradient function, the latter by its code only, so that a function reading
+    other state needs clear() when that state changes. Arrays are plain .npy files loaded with
+    mmap_mode='r', so a warm start costs a few file opens and processes loading the same entry
+    share its pages."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, content, cellDimension, paths=True):
+        h = hashlib.sha256()
+        h.update(content)
+        settings = [CACHE_VERSION, cellDimension, paths, Blueprint.precision, Blueprint.pathMode, Blueprint.exactPaths,
+                    Path.m_sigma, Path.b_sigma, Path.preGradientF, Path.mode,
+                    Fragrance.arrivalRadius, Fragrance.minArrivalRadius]
+        if Blueprint.pathMode == 'hierarchical':
+            # scipy is only imported when the routes depend on the hierarchy
+            from .hpa import HierarchicalGraph
+            settings += [Blueprint.clusterSize, HierarchicalGraph.longRun]
+        h.update(repr(settings).encode())
+        h.update(gradientKey(Path.gradPathF))
+        return h.hexdigest()
+
+    def clear(self):
+        """Drops every entry"""
+        for name in os.listdir(self.directory):
+            shutil.rmtree(self.entry(name), ignore_errors=True)
+
+    def entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def compile(self, source, cellDimension, paths=True, walls=False):
+        """Returns the compiled Layout of the SVG file source, building and storing it when the
+        cache has no entry for its content yet"""
+        with open(source, 'rb') as f:
+            content = f.read()
+
+        key = self.key(content, cellDimension, paths)
+        if not os.path.isdir(self.entry(key)):
+            layout = loadSVG(io.BytesIO(content), cellDimension)
+            bp = layout.blueprint
+            points = layout.points()
+
+            bp.calcFragrances(points)
+            if paths:
+                ids = list(points.keys())
+                bp.calcPaths([(points[idStart], points[idEnd], idStart + "-" + idEnd)
+                              for i, idStart in enumerate(ids) for idEnd in ids[i + 1:]])
+
+            self.save(key, layout)
+
+        return self.load(key, walls)
+
+    def save(self, key, layout):
+        bp = layout.blueprint
+        tmp = tempfile.mkdtemp(prefix='.' + key, dir=self.directory)
+
+        meta = {
+            'bounds': [bp.x1, bp.y1, bp.x2, bp.y2],
+            'translation': [bp.xTranslation, bp.yTranslation],
+            'cellDimension': bp.cellDimension,
+            'walls': [w.id for w in layout.walls],
+            'attractionPoints': [{'id': ap.id, 'cx': ap.cx, 'cy': ap.cy, 'r': ap.r}
+                                 for ap in layout.attractionPoints],
+            'entrances': [{'id': k, 'cx': p['cx'], 'cy': p['cy']} for k, p in layout.entrances.items()],
+            'exits': [{'id': k, 'cx': p['cx'], 'cy': p['cy']} for k, p in layout.exits.items()],
+            'fragrances': [{'id': k, 'location': list(bp.fragrances[k].location), 'radius': bp.fragrances[k].radius}
+                           for k in bp.fragranceIDs],
+            'paths': [{'id': p.id, 'start': list(p.start), 'end': list(p.end), 'sigma': [p.sigmaX, p.sigmaY],
+                       'path': [list(c) for c in p.path] if p.path else None}
+                      for p in bp.paths.values()],
+        }
+
+        with open(os.path.join(tmp, 'blueprint.json'), 'w') as f:
+            json.dump(meta, f)
+
+        corners = [[(w.topLeft['x'], w.topLeft['y']), (w.topRight['x'], w.topRight['y']),
+                    (w.bottomRight['x'], w.bottomRight['y']), (w.bottomLeft['x'], w.bottomLeft['y'])]
+                   for w in layout.walls]
+        np.save(os.path.join(tmp, 'walls.npy'), np.array(corners, dtype=float).reshape(-1, 4, 2))
+        np.save(os.path.join(tmp, 'maze.npy'), bp.maze)
+        fragrances = bp.fragranceStack
+        if fragrances is None:
+            fragrances = np.array([np.asarray(bp.fragrances[k].sniffingMap) for k in bp.fragranceIDs])
+        np.save(os.path.join(tmp, 'fragrances.npy'), fragrances.reshape((-1,) + bp.maze.shape))
+        np.save(os.path.join(tmp, 'paths.npy'), np.array([np.asarray(p.sniffingMap) for p in bp.paths.values()])
+                .reshape((-1,) + bp.maze.shape))
+
+        # publish the complete entry at once: concurrent readers never see it half written
+        try:
+            os.rename(tmp, self.entry(key))
+        except OSError:
+            shutil.rmtree(tmp)
+
+    def load(self, key, walls=False):
+        """Returns the cached Layout stored under key, or None. Its maps are read-only memory maps;
+        the Wall objects are only rebuilt on demand, with walls=True"""
+        entry = self.entry(key)
+        if not os.path.isdir(entry):
+            return None
+
+        with open(os.path.join(entry, 'blueprint.json')) as f:
+            meta = json.load(f)
+
+        bp = Blueprint(*meta['bounds'])
+        bp.setTranslation(*meta['translation'])
+        bp.setCellDimension(meta['cellDimension'], initMaze=False)
+        bp.empty()
+        bp.maze = np.load(os.path.join(entry, 'maze.npy'), mmap_mode='r')
+
+        stack = np.load(os.path.join(entry, 'fragrances.npy'), mmap_mode='r')
+        bp.setFragranceStack([f['id'] for f in meta['fragrances']],
+                             [tuple(f['location']) for f in meta['fragrances']], stack,
+                             [f['radius'] for f in meta['fragrances']])
+
+        sniffingMaps = np.load(os.path.join(entry, 'paths.npy'), mmap_mode='r')
+        for k, p in enumerate(meta['paths']):
+            path = Path(tuple(p['start']), tuple(p['end']), p['id'])
+            path.sigmaX, path.sigmaY = p['sigma']
+            path.path = [tuple(c) for c in p['path']] if p['path'] is not None else None
+            path.sniffingMap = sniffingMaps[k]
+            bp.paths[path.id] = path
+
+        attractionPoints = []
+        for p in meta['attractionPoints']:
+            ap = attractionPoint(p['cx'], p['cy'], p['r'])
+            ap.setID(p['id'])
+            attractionPoints.append(ap)
+        entrances = {p['id']: p for p in meta['entrances']}
+        exits = {p['id']: p for p in meta['exits']}
+
+        wallList = None
+        if walls:
+            wallList = []
+            for idWall, corners in zip(meta['walls'], np.load(os.path.join(entry, 'walls.npy'))):
+                wall = Wall(0, 0, 0, 0)
+                wall.setID(idWall)
+                wall.topLeft, wall.topRight, wall.bottomRight, wall.bottomLeft = \
+                    [{'x': float(x), 'y': float(y)} for x, y in corners]
+                wall.initPolygonObject()
+                wallList.append(wall)
+            bp.walls = list(wallList)
+
+        return Layout(bp, wallList, attractionPoints, entrances, exits)
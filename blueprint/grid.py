@@ -0,0 +1,193 @@
+import numpy as np
+
+
+def neighbourMask(shape, position):
+    """Returns a boolean mask of the in-grid 8-neighbours of position, which may lie off the grid"""
+    mask = np.zeros(shape, dtype=bool)
+
+    x0 = max(position[0] - 1, 0)
+    x1 = min(position[0] + 2, shape[0])
+    y0 = max(position[1] - 1, 0)
+    y1 = min(position[1] + 2, shape[1])
+    if x0 >= x1 or y0 >= y1:
+        return mask
+
+    mask[x0:x1, y0:y1] = True
+    if 0 <= position[0] < shape[0] and 0 <= position[1] < shape[1]:
+        mask[position[0], position[1]] = False
+
+    return mask
+
+
+def isFree(maze, cell):
+    """True when cell lies on the grid of maze and is not a wall"""
+    return 0 <= cell[0] < maze.shape[0] and 0 <= cell[1] < maze.shape[1] and maze[cell[0], cell[1]] == 0
+
+
+def deduplicate(keys, scratch):
+    """Returns keys without repetitions, in linear time
+
+    Every key claims its slot of scratch, which must be 0 there and is left untouched."""
+    claims = -1 - np.arange(len(keys), dtype=scratch.dtype)
+    scratch[keys] = claims
+    unique = keys[scratch[keys] == claims]
+    scratch[unique] = 0
+    return unique
+
+
+def paddedGrid(free):
+    """Returns (walkable, stride, shifts): free flattened with a closed border around it, which
+    spares every bounds check on shifted indices, the row stride of that bordered grid and the
+    flat offsets of the 8 neighbours"""
+    rows, cols = free.shape
+    stride = cols + 2
+    walkable = np.zeros((rows + 2, stride), dtype=bool)
+    walkable[1:-1, 1:-1] = free
+    shifts = np.array([-stride - 1, -stride, -stride + 1, -1, 1, stride - 1, stride, stride + 1])
+    return walkable.ravel(), stride, shifts
+
+
+def wavefront(free, start):
+    """Breadth-first wavefront over the 8-connected free cells
+
+    Returns an int array holding, for every free cell reached, the number of steps from start
+    (the neighbours of start are at 1), and 0 elsewhere. start itself is not marked before the
+    wavefront comes back to it, exactly like the cell-by-cell search in Fragrance."""
+    walkable, stride, shifts = paddedGrid(free)
+    steps = np.zeros(walkable.shape, dtype=np.int64)
+
+    x, y = np.nonzero(neighbourMask(free.shape, start))
+    frontier = (x + 1) * stride + y + 1
+    frontier = frontier[walkable[frontier]]
+
+    level = 1
+    while len(frontier):
+        steps[frontier] = level
+        walkable[frontier] = False
+
+        # shift the whole frontier in the 8 directions and keep the cells not reached yet
+        nextCells = (frontier[:, None] + shifts).ravel()
+        frontier = deduplicate(nextCells[walkable[nextCells]], steps)
+        level += 1
+
+    return steps.reshape(-1, stride)[1:-1, 1:-1]
+
+
+def walkableAdjacency(free):
+    """Returns the 8-connected adjacency of the free cells in CSR form
+
+    cells holds the flat grid index of every node, and the neighbours of node k are
+    indices[indptr[k]:indptr[k + 1]]."""
+    walkable, stride, shifts = paddedGrid(free)
+    cells = np.flatnonzero(free)
+
+    # both grids list the free cells in the same order, and the border holds no node
+    padded = np.flatnonzero(walkable)
+    nodes = np.full(walkable.shape, -1, dtype=np.int64)
+    nodes[padded] = np.arange(len(cells))
+
+    neighbours = nodes[padded[:, None] + shifts]
+    valid = neighbours >= 0
+
+    indptr = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    indices = neighbours[valid]
+
+    return cells, indptr, indices
+
+
+def multiSourceWavefront(free, starts, adjacency=None):
+    """Runs the wavefront of every start at once over a shared CSR adjacency
+
+    Returns an int array of shape (len(starts), rows, cols), each layer equal to
+    wavefront(free, start)."""
+    if adjacency is None:
+        adjacency = walkableAdjacency(free)
+    cells, indptr, indices = adjacency
+    nCells = len(cells)
+
+    node = np.full(free.size, -1, dtype=np.int64)
+    node[cells] = np.arange(nCells)
+
+    # every (source, node) pair is one flat key, so all the wavefronts advance together
+    steps = np.zeros((len(starts), nCells), dtype=np.int32)
+    flatSteps = steps.ravel()
+
+    seeds = [k * nCells + node[np.flatnonzero(neighbourMask(free.shape, start) & free)]
+             for k, start in enumerate(starts)]
+    frontier = np.concatenate(seeds) if seeds else np.empty(0, dtype=np.int64)
+
+    level = 1
+    while len(frontier):
+        flatSteps[frontier] = level
+
+        source, current = np.divmod(frontier, nCells)
+        counts = indptr[current + 1] - indptr[current]
+        offsets = np.repeat(indptr[current] - (np.cumsum(counts) - counts), counts)
+        neighbours = indices[offsets + np.arange(counts.sum())]
+
+        nextKeys = np.repeat(source * nCells, counts) + neighbours
+        frontier = deduplicate(nextKeys[flatSteps[nextKeys] == 0], flatSteps)
+        level += 1
+
+    grid = np.zeros((len(starts), free.size), dtype=np.int32)
+    grid[:, cells] = steps
+    return grid.reshape((len(starts),) + free.shape)
+
+
+def repairWavefront(levels, free, cells):
+    """Updates in place the wavefront levels of a grid whose cells switched between wall and free
+
+    levels holds the steps from the sources, which are at 0, and -1 where nothing was reached;
+    free is the grid after the change and cells the (i, j) arrays of the switched cells. Only
+    the cells whose level changes and their neighbours are visited: first the cells left
+    without any neighbour one step closer, then, level by level from the border of the change,
+    every cell that can be reached again or sooner."""
+    walkable, stride, shifts = paddedGrid(free)
+    steps = np.full(walkable.shape, -1, dtype=np.int64)
+    steps.reshape(-1, stride)[1:-1, 1:-1] = levels
+
+    switched = (np.asarray(cells[0]) + 1) * stride + np.asarray(cells[1]) + 1
+    lost = np.zeros(walkable.shape, dtype=bool)
+
+    # a cell is lost when none of its free neighbours is one step closer any more; whenever a
+    # cell is lost, its neighbours one step further are checked again
+    frontier = switched[~walkable[switched] & (steps[switched] > 0)]
+    while len(frontier):
+        candidates = (frontier[:, None] + shifts).ravel()
+        origins = np.repeat(frontier, len(shifts))
+        candidates = np.unique(candidates[(steps[candidates] == steps[origins] + 1) & walkable[candidates]
+                                          & ~lost[candidates]])
+
+        around = candidates[:, None] + shifts
+        supported = (walkable[around] & ~lost[around] & (steps[around] == steps[candidates, None] - 1)).any(axis=1)
+        frontier = candidates[~supported]
+        lost[frontier] = True
+
+    region = np.concatenate([np.flatnonzero(lost), switched[walkable[switched]]])
+    steps[lost] = -1
+    steps[switched[~walkable[switched]]] = -1
+
+    around = region[:, None] + shifts
+    closest = np.where(walkable[around] & (steps[around] >= 0), steps[around], np.iinfo(np.int64).max).min(axis=1)
+    seeded = closest < np.iinfo(np.int64).max
+    queue = region[seeded]
+    queueLevels = closest[seeded] + 1
+
+    while len(queue):
+        level = queueLevels.min()
+        now = queueLevels == level
+        reached = np.unique(queue[now])
+        queue = queue[~now]
+        queueLevels = queueLevels[~now]
+
+        reached = reached[(steps[reached] < 0) | (steps[reached] > level)]
+        steps[reached] = level
+
+        nextCells = (reached[:, None] + shifts).ravel()
+        nextCells = nextCells[walkable[nextCells] & ((steps[nextCells] < 0) | (steps[nextCells] > level + 1))]
+        queue = np.concatenate([queue, nextCells])
+        queueLevels = np.concatenate([queueLevels, np.full(len(nextCells), level + 1)])
+
+    levels[...] = steps.reshape(-1, stride)[1:-1, 1:-1]
+    return levels
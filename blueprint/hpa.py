@@ -0,0 +1,219 @@
+import math
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from .astar import SQRT2, astar
+
+# forward half of the 8-neighbourhood as (dx, dy, diagonal): every cell pair is listed once
+FORWARD = [(0, 1, False), (1, 0, False), (1, 1, True), (1, -1, True)]
+
+
+class Cluster:
+    """A clusterSize x clusterSize block of the maze, with the shortest paths inside it from
+    every one of its sources (entrances and query points) to all of its cells"""
+
+    def __init__(self, maze, x0, x1, y0, y1, diagonalCost):
+        self.x0, self.x1, self.y0, self.y1 = x0, x1, y0, y1
+        free = maze[x0:x1, y0:y1] == 0
+        rows, cols = free.shape
+
+        self.local = np.full(free.shape, -1, dtype=np.int64)
+        self.cells = np.argwhere(free)
+        self.local[free] = np.arange(len(self.cells))
+
+        heads, tails, costs = [], [], []
+        for dx, dy, diagonal in FORWARD:
+            a = self.local[max(0, -dx):rows - max(0, dx), max(0, -dy):cols - max(0, dy)]
+            b = self.local[max(0, dx):rows - max(0, -dx), max(0, dy):cols - max(0, -dy)]
+            both = (a >= 0) & (b >= 0)
+            heads.append(a[both])
+            tails.append(b[both])
+            costs.append(np.full(both.sum(), diagonalCost if diagonal else 1.0))
+
+        n = len(self.cells)
+        self.graph = csr_matrix((np.concatenate(costs), (np.concatenate(heads), np.concatenate(tails))),
+                                shape=(n, n))
+        self.sources = {}
+        self.distances = np.empty((0, n))
+        self.predecessors = np.empty((0, n), dtype=np.int32)
+
+    def contains(self, cell):
+        return self.x0 <= cell[0] < self.x1 and self.y0 <= cell[1] < self.y1
+
+    def index(self, cell):
+        return int(self.local[cell[0] - self.x0, cell[1] - self.y0])
+
+    def addSources(self, cells):
+        """Searches the cluster from every new cell of cells at once"""
+        cells = [c for c in dict.fromkeys(cells) if c not in self.sources]
+        if not cells:
+            return
+
+        distances, predecessors = dijkstra(self.graph, directed=False, indices=[self.index(c) for c in cells],
+                                           return_predecessors=True)
+        for k, c in enumerate(cells):
+            self.sources[c] = len(self.distances) + k
+        self.distances = np.vstack([self.distances, distances])
+        self.predecessors = np.vstack([self.predecessors, predecessors])
+
+    def distance(self, source, cell):
+        return self.distances[self.sources[source], self.index(cell)]
+
+    def path(self, start, source):
+        """Cells from start to source, both included, along the shortest path inside the cluster"""
+        predecessors = self.predecessors[self.sources[source]]
+        i = self.index(start)
+        path = []
+        while i >= 0:
+            x, y = self.cells[i]
+            path.append((int(x) + self.x0, int(y) + self.y0))
+            i = predecessors[i]
+        return path
+
+
+class HierarchicalGraph:
+    """Hierarchical path-finding (HPA*) on a maze where any non-zero cell is a wall
+
+    The maze is cut in clusters of clusterSize x clusterSize cells. Entrances are placed once on
+    the walkable runs along every cluster border, one in the middle of a short run and one at
+    each end of a long one, and joined by their shortest distance inside each cluster. Queries
+    then link their end points to the entrances of their clusters and search this small
+    abstract graph, all from the same start at once. Moves cost like in astar: 1, or sqrt(2)
+    on the diagonal with heuristic='octile'. Refined paths are near-optimal; with exact=True
+    every reachable pair is routed again by astar and matches its output."""
+
+    longRun = 6
+
+    def __init__(self, maze, clusterSize=16, heuristic='euclidean'):
+        self.maze = np.asarray(maze)
+        self.clusterSize = clusterSize
+        self.heuristic = heuristic
+        diagonalCost = SQRT2 if heuristic == 'octile' else 1.0
+
+        rows, cols = self.maze.shape
+        self.clustersY = -(-cols // clusterSize)
+        self.clusters = [Cluster(self.maze, x0, min(x0 + clusterSize, rows), y0, min(y0 + clusterSize, cols),
+                                 diagonalCost)
+                         for x0 in range(0, rows, clusterSize) for y0 in range(0, cols, clusterSize)]
+
+        self.nodes = {}
+        self.cellOf = []
+        self.edges = {}
+
+        for a, b in self.transitions():
+            self.addEdge(self.node(a), self.node(b), 1.0)
+
+        self.addPoints(list(self.nodes))
+
+    def clusterOf(self, cell):
+        return self.clusters[(cell[0] // self.clusterSize) * self.clustersY + cell[1] // self.clusterSize]
+
+    def node(self, cell):
+        if cell not in self.nodes:
+            self.nodes[cell] = len(self.cellOf)
+            self.cellOf.append(cell)
+        return self.nodes[cell]
+
+    def addEdge(self, a, b, cost):
+        if a == b or not math.isfinite(cost):
+            return
+        key = (min(a, b), max(a, b))
+        self.edges[key] = min(cost, self.edges.get(key, math.inf))
+
+    def linkInside(self, cluster, cells, entrances):
+        for c in cells:
+            for e in entrances:
+                self.addEdge(self.nodes[c], self.nodes[e], cluster.distance(e, c))
+
+    def transitions(self):
+        """Pairs of facing walkable cells across every cluster border"""
+        free = self.maze == 0
+        rows, cols = free.shape
+        size = self.clusterSize
+
+        for x in range(size, rows, size):
+            for y0 in range(0, cols, size):
+                y1 = min(y0 + size, cols)
+                both = free[x - 1, y0:y1] & free[x, y0:y1]
+                for y in self.entrancesOf(both):
+                    yield (x - 1, y0 + y), (x, y0 + y)
+
+        for y in range(size, cols, size):
+            for x0 in range(0, rows, size):
+                x1 = min(x0 + size, rows)
+                both = free[x0:x1, y - 1] & free[x0:x1, y]
+                for x in self.entrancesOf(both):
+                    yield (x0 + x, y - 1), (x0 + x, y)
+
+    def entrancesOf(self, both):
+        # offsets of the entrances chosen on every run of True in both
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], both.astype(np.int8), [0]])))
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            if end - start >= self.longRun:
+                yield start
+                yield end - 1
+            else:
+                yield (start + end - 1) // 2
+
+    def addPoints(self, cells):
+        """Links query cells to the entrances of their clusters, and to each other inside them"""
+        byCluster = {}
+        for cell in dict.fromkeys(cells):
+            byCluster.setdefault(id(self.clusterOf(cell)), (self.clusterOf(cell), []))[1].append(cell)
+
+        for cluster, points in byCluster.values():
+            new = [c for c in points if c not in cluster.sources]
+            cluster.addSources(new)
+            for c in new:
+                self.node(c)
+            self.linkInside(cluster, new, list(cluster.sources))
+
+    def walkable(self, cell):
+        return 0 <= cell[0] < self.maze.shape[0] and 0 <= cell[1] < self.maze.shape[1] and self.maze[cell] == 0
+
+    def findPath(self, start, end, exact=False):
+        return self.findPaths([(start, end)], exact)[0]
+
+    def findPaths(self, pairs, exact=False):
+        """Returns the path of every (start, end) pair, as astar would: a list of cells, or None"""
+        pairs = [(tuple(int(i) for i in s), tuple(int(i) for i in e)) for s, e in pairs]
+        points = [c for pair in pairs for c in pair if self.walkable(c)]
+        self.addPoints(points)
+
+        n = len(self.cellOf)
+        keys = np.array(list(self.edges.keys()), dtype=np.int64).reshape(-1, 2)
+        graph = csr_matrix((np.array(list(self.edges.values())), (keys[:, 0], keys[:, 1])), shape=(n, n))
+
+        starts = list(dict.fromkeys(s for s, e in pairs if self.walkable(s)))
+        if not starts:
+            return [None] * len(pairs)
+        distances, predecessors = dijkstra(graph, directed=False, indices=[self.nodes[s] for s in starts],
+                                           return_predecessors=True)
+        row = {s: k for k, s in enumerate(starts)}
+
+        paths = []
+        for s, e in pairs:
+            if not (self.walkable(s) and self.walkable(e)) or not np.isfinite(distances[row[s], self.nodes[e]]):
+                paths.append(None)
+            elif exact:
+                paths.append(astar(self.maze, s, e, self.heuristic))
+            else:
+                paths.append(self.refine(s, e, predecessors[row[s]]))
+        return paths
+
+    def refine(self, start, end, predecessors):
+        nodes = [self.nodes[end]]
+        while nodes[-1] != self.nodes[start]:
+            nodes.append(predecessors[nodes[-1]])
+        cells = [self.cellOf[i] for i in reversed(nodes)]
+
+        path = [start]
+        for a, b in zip(cells, cells[1:]):
+            cluster = self.clusterOf(a)
+            if cluster.contains(b):
+                path.extend(cluster.path(a, b)[1:])
+            else:
+                path.append(b)
+        return path
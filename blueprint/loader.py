@@ -0,0 +1,175 @@
+import math
+import re
+import xml.etree.ElementTree as ET
+
+from .Blueprint import Blueprint
+from .ShopObjects import Wall, attractionPoint
+
+SODIPODI = '{http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd}'
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+TRANSFORM = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+
+
+def multiply(m, n):
+    """Composes two SVG matrices (a, b, c, d, e, f): the result applies n first, then m"""
+    a1, b1, c1, d1, e1, f1 = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def parseTransform(transform):
+    '''Returns the matrix of an SVG transform list, see
+    https://developer.mozilla.org/en-US/docs/Web/SVG/Attribute/transform '''
+    matrix = IDENTITY
+    if not transform:
+        return matrix
+
+    for name, args in TRANSFORM.findall(transform):
+        v = [float(i) for i in NUMBER.findall(args)]
+
+        if name == 'matrix':
+            m = tuple(v[:6])
+        elif name == 'translate':
+            m = (1.0, 0.0, 0.0, 1.0, v[0], v[1] if len(v) > 1 else 0.0)
+        elif name == 'scale':
+            m = (v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0], 0.0, 0.0)
+        elif name == 'rotate':
+            a = math.radians(v[0])
+            m = (math.cos(a), math.sin(a), -math.sin(a), math.cos(a), 0.0, 0.0)
+            if len(v) == 3:
+                m = multiply((1.0, 0.0, 0.0, 1.0, v[1], v[2]), multiply(m, (1.0, 0.0, 0.0, 1.0, -v[1], -v[2])))
+        elif name == 'skewX':
+            m = (1.0, 0.0, math.tan(math.radians(v[0])), 1.0, 0.0, 0.0)
+        else:
+            m = (1.0, math.tan(math.radians(v[0])), 0.0, 1.0, 0.0, 0.0)
+
+        matrix = multiply(matrix, m)
+
+    return matrix
+
+
+def applyMatrix(matrix, x, y):
+    a, b, c, d, e, f = matrix
+    return (a * x + c * y + e, b * x + d * y + f)
+
+
+def number(value, default=0.0):
+    if value is None:
+        return default
+    return float(NUMBER.match(value.strip()).group())
+
+
+def localName(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+class Layout:
+    """A floor plan read from an SVG file, with every coordinate in document space"""
+
+    def __init__(self, blueprint, walls, attractionPoints, entrances, exits, index=None):
+        self.blueprint = blueprint
+        self.walls = walls
+        self.attractionPoints = attractionPoints
+        self.entrances = entrances
+        self.exits = exits
+        self.index = index
+
+    def getIndex(self):
+        """Returns the SpatialIndex of the walls and attraction points, built on first use"""
+        if self.index is None:
+            from .spatial import SpatialIndex
+            self.index = SpatialIndex(self.walls or (), self.attractionPoints)
+        return self.index
+
+    def attractionPointsAt(self, cx, cy, r=None):
+        """Attraction points within r of (cx, cy) in document space or, without r, those whose
+        circle holds it"""
+        return self.getIndex().pointsWithin(cx, cy, r)
+
+    def points(self):
+        """Entrances, exits and attraction points in the {id: {'cx', 'cy'}} form Blueprint expects"""
+        points = {}
+        for entranceID, entrance in self.entrances.items():
+            points[entranceID] = entrance
+        for exitID, exit in self.exits.items():
+            points[exitID] = exit
+        for ap in self.attractionPoints:
+            points[ap.id] = {'object': ap, 'cx': ap.cx, 'cy': ap.cy}
+        return points
+
+
+def loadSVG(source, cellDimension=None):
+    """Reads walls (rect), attraction points (circle), entrances (entrata*) and exits (uscita*)
+    from an SVG in a single streaming pass, composing the transforms of all nested groups
+
+    Elements are dropped as soon as they are read, so memory does not grow with the file.
+    When cellDimension is given, the maze of the returned blueprint is already defined."""
+    blueprint = None
+    walls = []
+    attractionPoints = []
+    entrances = {}
+    exits = {}
+
+    stack = []
+    ctm = [IDENTITY]
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if stack:
+                ctm.append(multiply(ctm[-1], parseTransform(elem.get('transform'))))
+            else:
+                ctm.append(IDENTITY)
+            stack.append(elem)
+
+            if blueprint is None and localName(elem.tag) == 'svg':
+                viewBox = elem.get('viewBox')
+                if viewBox:
+                    dimensions = [float(i) for i in NUMBER.findall(viewBox)]
+                else:
+                    dimensions = [0.0, 0.0, number(elem.get('width')), number(elem.get('height'))]
+                blueprint = Blueprint(dimensions[0], dimensions[1], dimensions[2], dimensions[3])
+                blueprint.setTranslation(0.0, 0.0)
+            continue
+
+        tag = localName(elem.tag)
+        matrix = ctm[-1]
+        idElem = elem.get('id')
+
+        if tag == 'rect':
+            wall = Wall(number(elem.get('x')), number(elem.get('y')),
+                        number(elem.get('width')), number(elem.get('height')),
+                        matrix if matrix != IDENTITY else False)
+            wall.setID(idElem)
+            walls.append(wall)
+
+        elif tag == 'circle':
+            cx, cy = applyMatrix(matrix, number(elem.get('cx')), number(elem.get('cy')))
+            scale = math.sqrt(abs(matrix[0] * matrix[3] - matrix[1] * matrix[2]))
+            circle = attractionPoint(cx, cy, number(elem.get('r')) * scale)
+            circle.setID(idElem)
+            attractionPoints.append(circle)
+
+        elif tag == 'path' and idElem and idElem.startswith(('entrata', 'uscita')):
+            cx, cy = applyMatrix(matrix, number(elem.get(SODIPODI + 'cx')), number(elem.get(SODIPODI + 'cy')))
+            ref = entrances if idElem.startswith('entrata') else exits
+            ref[idElem] = {'id': idElem, 'cx': cx, 'cy': cy}
+
+        # forget the element once read: the parent only ever holds its current child
+        stack.pop()
+        ctm.pop()
+        if stack:
+            stack[-1].remove(elem)
+        elem.clear()
+
+    layout = Layout(blueprint, walls, attractionPoints, entrances, exits)
+    if cellDimension:
+        blueprint.setCellDimension(cellDimension)
+        blueprint.defineMaze(walls)
+        layout.index = blueprint.getIndex()
+        layout.index.setAttractionPoints(attractionPoints)
+
+    return layout
@@ -0,0 +1,113 @@
+import numpy as np
+
+from .policy import CENTRE
+
+
+class OccupancyAccumulator:
+    """Aggregates walker pathways over a Blueprint grid
+
+    dwell counts the recorded steps spent on every cell, visits how many times a walker
+    entered it, and transitions[x, y, d] the moves from (x, y) in the 3x3 direction d of
+    Walker.getRandomDirection (CENTRE when the walker stayed)."""
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.dwell = np.zeros(self.shape, dtype=np.int64)
+        self.visits = np.zeros(self.shape, dtype=np.int64)
+        self.transitions = np.zeros(self.shape + (9,), dtype=np.int64)
+        self.walkers = 0
+
+        # last (step, x, y) of every walker seen in a chunk, to join chunks that split a pathway
+        self.last = {}
+
+    def addPathway(self, pathway):
+        self.addPathways([pathway])
+
+    def addPathways(self, pathways):
+        pathways = [np.asarray(p, dtype=np.int64).reshape(-1, 2) for p in pathways]
+        pathways = [p for p in pathways if len(p)]
+        if not pathways:
+            return
+
+        positions = np.concatenate(pathways)
+        starts = np.zeros(len(positions), dtype=bool)
+        starts[np.cumsum([0] + [len(p) for p in pathways[:-1]])] = True
+
+        self.accumulate(positions, starts)
+        self.walkers += len(pathways)
+
+    def addChunk(self, chunk):
+        """Adds a trajectory chunk, as produced by WalkerBatch.iterWalking or a sink"""
+        chunk = chunk[np.lexsort((chunk['step'], chunk['walker']))]
+        if not len(chunk):
+            return
+
+        walker = chunk['walker']
+        step = chunk['step']
+        positions = np.stack([chunk['x'], chunk['y']], axis=1).astype(np.int64)
+
+        starts = np.ones(len(chunk), dtype=bool)
+        starts[1:] = walker[1:] != walker[:-1]
+        ends = np.append(starts[1:], True)
+
+        # a walker continuing from an earlier chunk gets its last position back in front,
+        # as a skipped row that is only the origin of its first move
+        insertAt, insertPositions = [], []
+        for k in np.flatnonzero(starts):
+            last = self.last.get(int(walker[k]))
+            if last is None:
+                self.walkers += 1
+            elif last[0] + 1 == step[k]:
+                insertAt.append(k)
+                insertPositions.append(last[1:])
+                starts[k] = False
+
+        for k in np.flatnonzero(ends):
+            self.last[int(walker[k])] = (int(step[k]), int(positions[k, 0]), int(positions[k, 1]))
+
+        skip = np.zeros(len(chunk), dtype=bool)
+        if insertAt:
+            positions = np.insert(positions, insertAt, insertPositions, axis=0)
+            starts = np.insert(starts, insertAt, True)
+            skip = np.insert(skip, insertAt, True)
+
+        self.accumulate(positions, starts, skip)
+
+    def accumulate(self, positions, starts, skip=None):
+        # consecutive rows belong to the same walker unless starts says otherwise
+        cells = positions[:, 0] * self.shape[1] + positions[:, 1]
+        counted = np.ones(len(cells), dtype=bool) if skip is None else ~skip
+
+        self.dwell += np.bincount(cells[counted], minlength=self.dwell.size).reshape(self.shape)
+
+        moved = np.ones(len(cells), dtype=bool)
+        moved[1:] = cells[1:] != cells[:-1]
+        entered = counted & (starts | moved)
+        self.visits += np.bincount(cells[entered], minlength=self.visits.size).reshape(self.shape)
+
+        follows = ~starts[1:]
+        dx = positions[1:, 0] - positions[:-1, 0]
+        dy = positions[1:, 1] - positions[:-1, 1]
+        follows &= (np.abs(dx) <= 1) & (np.abs(dy) <= 1)
+
+        direction = 3 * (1 - dy[follows]) + dx[follows] + 1
+        moves = cells[:-1][follows] * 9 + direction
+        self.transitions += np.bincount(moves, minlength=self.transitions.size).reshape(self.transitions.shape)
+
+    def merge(self, other):
+        """Adds the counts of another accumulator over the same grid, e.g. from a parallel worker"""
+        if other.shape != self.shape:
+            raise ValueError("cannot merge occupancies of grids " + str(self.shape) + " and " + str(other.shape))
+
+        self.dwell += other.dwell
+        self.visits += other.visits
+        self.transitions += other.transitions
+        self.walkers += other.walkers
+        self.last.update(other.last)
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def stays(self):
+        return self.transitions[..., CENTRE]
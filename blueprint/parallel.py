@@ -0,0 +1,205 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .Blueprint import fragranceStack, sniffingMapStack
+from .occupancy import OccupancyAccumulator
+from .trajectory import NpyChunkWriter
+from .WalkerBatch import WalkerBatch, stackArrivals, stackPolicies
+
+
+class SharedArray:
+    """A NumPy array in a named shared memory block, which workers attach to through spec()"""
+
+    def __init__(self, shape, dtype=float):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def fromArray(cls, a):
+        shared = cls(a.shape, a.dtype)
+        shared.array[...] = a
+        return shared
+
+    def spec(self):
+        return (self.shm.name, self.array.shape, self.array.dtype.str)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(spec):
+    """Maps a SharedArray.spec() in a worker, without copying: returns (shm, array)"""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def pathTask(mazeSpec, outSpec, tasks, search):
+    mazeShm, maze = attach(mazeSpec)
+    outShm, out = attach(outSpec)
+
+    if search:
+        for k, p in tasks:
+            p.findBestPath(maze)
+    first = tasks[0][0]
+    out[first:first + len(tasks)] = sniffingMapStack(maze, [p for k, p in tasks], out.dtype)
+    routes = [p.path for k, p in tasks]
+
+    del maze, out
+    mazeShm.close()
+    outShm.close()
+    return routes
+
+
+def fragranceTask(mazeSpec, outSpec, first, locations):
+    mazeShm, maze = attach(mazeSpec)
+    outShm, out = attach(outSpec)
+
+    out[first:first + len(locations)] = fragranceStack(maze, locations, dtype=out.dtype)
+
+    del maze, out
+    mazeShm.close()
+    outShm.close()
+
+
+def walkerTask(directionsSpec, countsSpec, arrivals, starts, itineraries, seed, first, directory, occupancy):
+    directionsShm, directions = attach(directionsSpec)
+    countsShm, counts = attach(countsSpec)
+
+    batch = WalkerBatch(starts, itineraries, seed=seed, policies=(directions, counts), arrivals=arrivals,
+                        firstWalker=first)
+    if occupancy:
+        pathways = OccupancyAccumulator(counts.shape[1:])
+        batch.stream(pathways.addChunk)
+        pathways.last = {}
+    elif directory is None:
+        pathways = batch.startWalking()
+    else:
+        batch.stream(NpyChunkWriter(directory, 'walkers-' + str(first).zfill(9)))
+        pathways = None
+
+    del batch, directions, counts
+    directionsShm.close()
+    countsShm.close()
+    return pathways
+
+
+class ParallelRunner:
+    """Fans path, fragrance and walker computations of a Blueprint out to a process pool
+
+    The maze or the fragrance step policies are published once per call in shared memory, and
+    work is cut in chunks of chunkSize items. Walker chunks are seeded from SeedSequence(seed).spawn,
+    so results only depend on seed and chunkSize, never on the number of workers."""
+
+    def __init__(self, blueprint, workers=None, chunkSize=64):
+        self.blueprint = blueprint
+        self.workers = workers or os.cpu_count()
+        self.chunkSize = chunkSize
+        self.executor = ProcessPoolExecutor(self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def chunks(self, n):
+        return [(i, min(i + self.chunkSize, n)) for i in range(0, n, self.chunkSize)]
+
+    def calcPaths(self, pairs, dtype=None, mode=None):
+        """Same arguments as Blueprint.calcPaths
+
+        astar routes are searched by the workers along with the sniffing maps; hierarchical and
+        fragrance routes share the graph or fragrances kept by the blueprint, so they are found
+        here first and the workers only build the maps."""
+        bp = self.blueprint
+        dtype = dtype or bp.dtypes()[2]
+        paths = [bp.newPath(start, end, id) for start, end, id in pairs]
+        search = (mode or bp.pathMode) not in ('hierarchical', 'fragrance')
+        if not search:
+            bp.findRoutes(paths, mode)
+
+        maze = SharedArray.fromArray(bp.maze)
+        out = SharedArray((len(paths),) + bp.maze.shape, dtype)
+        try:
+            futures = [self.executor.submit(pathTask, maze.spec(), out.spec(),
+                                            [(k, paths[k]) for k in range(i, j)], search)
+                       for i, j in self.chunks(len(paths))]
+            routes = [route for future in futures for route in future.result()]
+            stack = np.array(out.array)
+        finally:
+            maze.close()
+            out.close()
+
+        for k, (p, route) in enumerate(zip(paths, routes)):
+            p.path = route
+            p.sniffingMap = bp.storeMap(stack[k])
+            bp.paths[p.id] = p
+
+    def calcFragrances(self, points):
+        bp = self.blueprint
+        ids = list(points.keys())
+        locations = [bp.transformPoint(points[i]['cx'], points[i]['cy']) for i in ids]
+
+        maze = SharedArray.fromArray(bp.maze)
+        out = SharedArray((len(ids),) + bp.maze.shape, bp.dtypes()[1])
+        try:
+            futures = [self.executor.submit(fragranceTask, maze.spec(), out.spec(), i, locations[i:j])
+                       for i, j in self.chunks(len(ids))]
+            for future in futures:
+                future.result()
+            stack = np.array(out.array)
+        finally:
+            maze.close()
+            out.close()
+
+        bp.setFragranceStack(ids, locations, stack, [bp.arrivalRadius(points[i]) for i in ids])
+
+    def simulateWalkers(self, starts, itineraries, seed=None, directory=None, occupancy=False):
+        """Same arguments and result as Blueprint.simulateWalkers
+
+        With a directory, every worker streams its trajectory chunks there as .npy files
+        instead of sending pathways back, and nothing is returned. With occupancy, workers
+        only send back their OccupancyAccumulator, and the merged one is returned."""
+        bp = self.blueprint
+        starts = [bp.transformPoint(start['cx'], start['cy']) for start in starts]
+
+        ids = list(dict.fromkeys(fID for pathIDs in itineraries for fID in pathIDs))
+        index = {fID: k for k, fID in enumerate(ids)}
+        itineraries = [[index[fID] for fID in pathIDs] for pathIDs in itineraries]
+
+        fragrances = [bp.fragrances[fID] for fID in ids]
+        arrivals = stackArrivals(fragrances)
+
+        chunks = self.chunks(len(starts))
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+
+        directions = SharedArray((len(fragrances),) + bp.maze.shape + (8,), np.int8)
+        counts = SharedArray((len(fragrances),) + bp.maze.shape, np.int8)
+        stackPolicies(fragrances, directions.array, counts.array)
+        try:
+            futures = [self.executor.submit(walkerTask, directions.spec(), counts.spec(), arrivals,
+                                            starts[i:j], itineraries[i:j], s, i, directory, occupancy)
+                       for (i, j), s in zip(chunks, seeds)]
+            results = [future.result() for future in futures]
+            if occupancy:
+                merged = OccupancyAccumulator(bp.maze.shape)
+                for partial in results:
+                    merged.merge(partial)
+                return merged
+            if directory is not None:
+                return None
+            return [pathway for pathways in results for pathway in pathways]
+        finally:
+            directions.close()
+            counts.close()
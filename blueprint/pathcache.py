@@ -0,0 +1,105 @@
+import os
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PathCache:
+    """Paths with their sniffing maps, kept within budget bytes of maps and evicting the least
+    recently used first
+
+    Without budget nothing is ever evicted. With a spill directory, the map of an evicted path
+    is written there and read back on the next get, through load when given (e.g. to tile it
+    again); the Path object itself, with its route, stays in memory either way. Without a
+    directory the evicted path is simply forgotten."""
+
+    def __init__(self, budget=None, directory=None, load=None):
+        self.budget = budget
+        self.directory = directory
+        self.load = load
+        self.entries = OrderedDict()
+        self.spilled = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries or key in self.spilled
+
+    def fileOf(self, key):
+        return os.path.join(self.directory, '-'.join(str(int(i)) for cell in key for i in cell) + '.npy')
+
+    def get(self, key):
+        """Returns the path of key, most recently used from now on, or None when not cached"""
+        path = self.entries.get(key)
+        if path is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return path
+
+        path = self.spilled.pop(key, None)
+        if path is None:
+            self.misses += 1
+            return None
+
+        sniffingMap = np.load(self.fileOf(key))
+        os.remove(self.fileOf(key))
+        path.sniffingMap = sniffingMap if self.load is None else self.load(sniffingMap)
+        self.hits += 1
+        self.put(key, path)
+        return path
+
+    def put(self, key, path):
+        self.discard(key)
+        self.entries[key] = path
+        self.nbytes += path.sniffingMap.nbytes
+        self.shrink()
+
+    def configure(self, budget, directory):
+        """Changes budget and spill directory in place, evicting down to the new budget; spilled
+        maps move to the new directory, or are forgotten without one"""
+        if directory != self.directory:
+            if directory is not None:
+                os.makedirs(directory, exist_ok=True)
+            for key in list(self.spilled):
+                if directory is None:
+                    self.discard(key)
+                else:
+                    shutil.move(self.fileOf(key), os.path.join(directory, os.path.basename(self.fileOf(key))))
+            self.directory = directory
+
+        self.budget = budget
+        self.shrink()
+
+    def shrink(self):
+        # the most recent path always stays, even when it alone exceeds the budget
+        while self.budget is not None and self.nbytes > self.budget and len(self.entries) > 1:
+            self.evict()
+
+    def evict(self):
+        key, path = self.entries.popitem(last=False)
+        self.nbytes -= path.sniffingMap.nbytes
+        if self.directory is not None:
+            np.save(self.fileOf(key), np.asarray(path.sniffingMap))
+            path.sniffingMap = None
+            self.spilled[key] = path
+
+    def discard(self, key):
+        path = self.entries.pop(key, None)
+        if path is not None:
+            self.nbytes -= path.sniffingMap.nbytes
+        if self.spilled.pop(key, None) is not None:
+            os.remove(self.fileOf(key))
+
+    def clear(self):
+        for key in list(self.spilled):
+            self.discard(key)
+        self.entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,61 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def plotMaze(maze,displayVal=False):
+    figure = plt.figure(figsize=[15, 15], dpi=90)
+
+    plt.imshow(np.rot90(maze), cmap='plasma', interpolation='nearest')
+    plt.xlabel("$x$")
+    plt.ylabel("$y$")
+    plt.gca().invert_yaxis()
+
+    if displayVal:
+        for (j, i), label in np.ndenumerate(np.rot90(maze)):
+            plt.gca().text(i, j, int(label), ha='center', va='center')
+
+    plt.show()
+
+def plotSniffingMapPath(maze, path,title=None):
+    preGrad = np.rot90(path.getPreGradientMap(maze))
+
+    fig, ax = plt.subplots(1,2, figsize=[15, 15], dpi=90)
+
+    plt.sca(ax[0])
+
+    # Plot preGrad
+    plt.imshow(preGrad, cmap='plasma', interpolation='nearest')
+    plt.xlabel("$x$")
+    plt.ylabel("$y$")
+    plt.gca().invert_yaxis()
+
+    plt.sca(ax[1])
+
+    # Plot sniffing map
+    plt.imshow(np.rot90(path.sniffingMap), cmap='plasma', interpolation='nearest')
+    plt.xlabel("$x$")
+    plt.ylabel("$y$")
+    plt.title("$\sigma_x = " + str(path.sigmaX) + "\quad \sigma_y = " + str(path.sigmaY) + "$")
+    plt.gca().invert_yaxis()
+
+    if not title:
+        title = path.id
+
+    fig.suptitle(title, fontsize=16, y=0.72)
+
+    plt.show()
+
+def plotWalkerPathway(maze,walker,title=None):
+    a = np.copy(maze)
+
+    for i, (x, y) in enumerate(walker.pathway):
+        a[x][y] = walker.pathway[i]*i
+
+    figure = plt.figure(figsize=[15, 15], dpi=90)
+
+    plt.imshow(np.rot90(a), cmap='plasma', interpolation='nearest')
+    plt.xlabel("$x$")
+    plt.ylabel("$y$")
+    plt.gca().invert_yaxis()
+
+    plt.show()
@@ -0,0 +1,70 @@
+import numpy as np
+
+from .tiles import TiledGrid
+
+# offsets of the flattened 3x3 neighbourhood used by Walker.getRandomDirection
+DX = np.array([-1, 0, 1, -1, 0, 1, -1, 0, 1])
+DY = np.array([1, 1, 1, 0, 0, 0, -1, -1, -1])
+CENTRE = 4
+
+
+def padMap(sniffingMap):
+    """Returns sniffingMap padded with the values getRandomDirection sees off the grid:
+    -1 before the first row/column, -10 after the last one"""
+    padded = np.empty((sniffingMap.shape[0] + 2, sniffingMap.shape[1] + 2))
+    padded[1:-1, 1:-1] = sniffingMap
+    padded[-1, :] = -10
+    padded[:, -1] = -10
+    padded[0, :] = -1
+    padded[:, 0] = -1
+    return padded
+
+
+def stepPolicy(sniffingMap):
+    """Ranks the neighbourhood of every cell once for all walkers
+
+    Returns (directions, counts): directions[x, y] holds the 3x3 direction indices from the best
+    to the worst smelling neighbour, in the order getRandomDirection would rank them, and
+    counts[x, y] how many of them are not negative, i.e. can be walked to."""
+    if isinstance(sniffingMap, TiledGrid):
+        return tiledStepPolicy(sniffingMap)
+    return rankNeighbours(padMap(sniffingMap))
+
+
+def tiledStepPolicy(grid):
+    """stepPolicy of a TiledGrid, as two TiledGrids whose blocks are only ranked when first read"""
+    directions = TiledGrid(grid.shape, np.int8, 0, grid.tile, (8,))
+    counts = TiledGrid(grid.shape, np.int8, 0, grid.tile)
+
+    def load(ti, tj):
+        x0, x1, y0, y1 = grid.bounds(ti, tj)
+
+        # the block with a one cell halo, padded off the grid like padMap
+        padded = np.full((x1 - x0 + 2, y1 - y0 + 2), -10.0)
+        hx0, hx1, hy0, hy1 = max(x0 - 1, 0), min(x1 + 1, grid.shape[0]), max(y0 - 1, 0), min(y1 + 1, grid.shape[1])
+        padded[hx0 - x0 + 1:hx1 - x0 + 1, hy0 - y0 + 1:hy1 - y0 + 1] = grid.region(hx0, hx1, hy0, hy1)
+        if x0 == 0:
+            padded[0, :] = -1
+        if y0 == 0:
+            padded[:, 0] = -1
+
+        blockDirections, blockCounts = rankNeighbours(padded)
+        directions.setBlock(ti, tj, blockDirections)
+        counts.setBlock(ti, tj, blockCounts)
+
+    directions.loader = counts.loader = load
+    return directions, counts
+
+
+def rankNeighbours(padded):
+    rows, cols = padded.shape[0] - 2, padded.shape[1] - 2
+
+    x, y = np.meshgrid(np.arange(rows), np.arange(cols), indexing='ij')
+    vals = padded[x[..., None] + 1 + DX, y[..., None] + 1 + DY].reshape(-1, 9)
+    vals[:, CENTRE] = -1
+
+    # the centre is negative, so it can only appear after the walkable neighbours
+    ranked = np.argsort(vals, axis=1)[:, ::-1][:, :8]
+    counts = (vals >= 0).sum(axis=1)
+
+    return ranked.astype(np.int8).reshape(rows, cols, 8), counts.astype(np.int8).reshape(rows, cols)
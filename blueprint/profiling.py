@@ -0,0 +1,143 @@
+import functools
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# the Profile being recorded, if any: every hook is a single test of this global when disabled
+active = None
+
+
+class Stage:
+    __slots__ = ('calls', 'seconds', 'peakMemory')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peakMemory = 0
+
+    def asDict(self):
+        return {'calls': self.calls, 'seconds': self.seconds, 'peakMemory': self.peakMemory}
+
+
+class Profile:
+    """Wall time and peak memory of every stage, plus the counters of the hot paths
+
+    stages maps a stage name to its Stage: number of calls, total seconds and, when recorded
+    with memory=True, the largest number of bytes allocated by a single call on top of what
+    was allocated before it. counters maps a counter name to its total. callback, when given,
+    is called as callback(kind, name, value) with kind 'stage' at the end of every stage call,
+    with its seconds, and kind 'count' on every increment."""
+
+    def __init__(self, callback=None, memory=False):
+        self.callback = callback
+        self.memory = memory
+        self.stages = {}
+        self.counters = {}
+        self.frames = []
+        self.tracing = False
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+        if self.callback is not None:
+            self.callback('count', name, n)
+
+    def enter(self):
+        if not self.memory:
+            return
+        if self.frames:
+            self.frames[-1][1] = max(self.frames[-1][1], tracemalloc.get_traced_memory()[1])
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.frames.append([current, 0])
+
+    def exit(self, name, seconds):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage()
+        stage.calls += 1
+        stage.seconds += seconds
+
+        if self.memory:
+            start, peak = self.frames.pop()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            stage.peakMemory = max(stage.peakMemory, peak - start)
+            if self.frames:
+                self.frames[-1][1] = max(self.frames[-1][1], peak)
+
+        if self.callback is not None:
+            self.callback('stage', name, seconds)
+
+    def asDict(self):
+        return {'stages': {name: stage.asDict() for name, stage in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def __str__(self):
+        lines = ['%-32s %7s %10s %12s' % ('stage', 'calls', 'seconds', 'peak bytes')]
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+            lines.append('%-32s %7d %10.4f %12d' % (name, stage.calls, stage.seconds, stage.peakMemory))
+        for name, value in sorted(self.counters.items()):
+            lines.append('%-32s %7s %10s %12d' % (name, '', '', value))
+        return '\n'.join(lines)
+
+
+def enable(callback=None, memory=False):
+    """Starts recording into a new Profile and returns it; memory=True also traces allocations,
+    which slows everything down noticeably"""
+    global active
+    active = Profile(callback, memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        active.tracing = True
+    return active
+
+
+def disable():
+    """Stops recording and returns the Profile recorded so far"""
+    global active
+    recorded, active = active, None
+    if recorded is not None and recorded.tracing:
+        tracemalloc.stop()
+    return recorded
+
+
+@contextmanager
+def profile(callback=None, memory=False):
+    """with profile() as report: records everything run inside the block into report"""
+    report = enable(callback, memory)
+    try:
+        yield report
+    finally:
+        disable()
+
+
+def count(name, n=1):
+    if active is not None:
+        active.count(name, n)
+
+
+@contextmanager
+def stage(name):
+    if active is None:
+        yield
+        return
+
+    recording = active
+    recording.enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recording.exit(name, time.perf_counter() - start)
+
+
+def profiled(name):
+    """Decorator recording every call of the function as the stage name"""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return f(*args, **kwargs)
+            with stage(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,47 @@
+import numpy as np
+
+
+def containsXY(geometry, x, y):
+    # shapely is imported on the first wall rasterized, not with the package
+    try:
+        from shapely import contains_xy
+    except ImportError:  # shapely < 2.0
+        from shapely.vectorized import contains as contains_xy
+    return contains_xy(geometry, x, y)
+
+
+def cellCentres(n, cellDimension, translation=0.0):
+    """Returns the centres of n consecutive cells along one axis, in layout coordinates"""
+    i = np.arange(n)
+    return (i + 1) * cellDimension - cellDimension / 2 - translation
+
+
+def wallCells(wall, xCentres, yCentres):
+    """Returns the (i, j) index arrays of the cells whose centre lies strictly inside the wall"""
+    minX, minY, maxX, maxY = wall.poly.bounds
+
+    # bounding box culling: centres are sorted, so the candidate window is a pair of bisections
+    i0 = np.searchsorted(xCentres, minX, side='right')
+    i1 = np.searchsorted(xCentres, maxX, side='left')
+    j0 = np.searchsorted(yCentres, minY, side='right')
+    j1 = np.searchsorted(yCentres, maxY, side='left')
+    if i0 >= i1 or j0 >= j1:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    px, py = np.meshgrid(xCentres[i0:i1], yCentres[j0:j1], indexing='ij')
+    inside = containsXY(wall.poly, px, py)
+
+    i, j = np.nonzero(inside)
+    return i + i0, j + j0
+
+
+def rasterizeWalls(maze, walls, cellDimension, xTranslation=0.0, yTranslation=0.0, value=-1):
+    """Marks with value every cell of maze whose centre lies inside one of the walls"""
+    xCentres = cellCentres(maze.shape[0], cellDimension, xTranslation)
+    yCentres = cellCentres(maze.shape[1], cellDimension, yTranslation)
+
+    for wall in walls:
+        i, j = wallCells(wall, xCentres, yCentres)
+        maze[i, j] = value
+
+    return maze
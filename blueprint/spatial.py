@@ -0,0 +1,75 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from shapely.geometry import Point, box
+from shapely.strtree import STRtree
+
+from .raster import cellCentres, wallCells
+
+
+class SpatialIndex:
+    """Walls in an STRtree and attraction points in a k-d tree, in layout coordinates
+
+    Built once per layout and shared with the wall edits of a Blueprint, which only rasterize
+    the walls found over the window they change, and with the attraction point lookups of its
+    Layout. Adding or removing a wall only drops the tree, which is built again on the next
+    query. With setGrid, cellsCovered answers in cells of that grid."""
+
+    def __init__(self, walls=(), attractionPoints=()):
+        self.walls = list(walls)
+        self.tree = None
+        self.grid = None
+        self.setAttractionPoints(attractionPoints)
+
+    def setAttractionPoints(self, attractionPoints):
+        self.attractionPoints = list(attractionPoints)
+        self.centres = np.array([(ap.cx, ap.cy) for ap in self.attractionPoints], dtype=float).reshape(-1, 2)
+        self.radii = np.array([ap.r for ap in self.attractionPoints], dtype=float)
+        self.pointTree = cKDTree(self.centres) if len(self.centres) else None
+
+    def setGrid(self, shape, cellDimension, xTranslation=0.0, yTranslation=0.0):
+        self.grid = (cellCentres(shape[0], cellDimension, xTranslation),
+                     cellCentres(shape[1], cellDimension, yTranslation))
+
+    def addWall(self, wall):
+        self.walls.append(wall)
+        self.tree = None
+
+    def removeWall(self, wall):
+        self.walls.remove(wall)
+        self.tree = None
+
+    def getTree(self):
+        if self.tree is None:
+            self.tree = STRtree([wall.poly for wall in self.walls])
+        return self.tree
+
+    def query(self, geometry, predicate=None, distance=None):
+        if not self.walls:
+            return []
+        found = self.getTree().query(geometry, predicate=predicate, distance=distance)
+        return [self.walls[i] for i in np.sort(found)]
+
+    def wallsNear(self, x, y, distance=0.0):
+        """Walls at most distance away from (x, y); with distance 0, the walls touching it"""
+        return self.query(Point(x, y), 'dwithin', distance)
+
+    def wallsIn(self, minX, minY, maxX, maxY):
+        """Walls whose bounding box meets the rectangle, e.g. to rasterize only a window"""
+        return self.query(box(minX, minY, maxX, maxY))
+
+    def pointsWithin(self, x, y, r=None):
+        """Attraction points whose centre is at most r away from (x, y); without r, the
+        attraction points whose own circle holds (x, y)"""
+        if self.pointTree is None:
+            return []
+
+        if r is not None:
+            found = self.pointTree.query_ball_point((x, y), r)
+        else:
+            found = self.pointTree.query_ball_point((x, y), self.radii.max())
+            found = [k for k in found if np.hypot(*(self.centres[k] - (x, y))) <= self.radii[k]]
+        return [self.attractionPoints[k] for k in sorted(found)]
+
+    def cellsCovered(self, wall):
+        """Returns the (i, j) index arrays of the grid cells whose centre lies inside wall"""
+        return wallCells(wall, *self.grid)
@@ -0,0 +1,161 @@
+import numpy as np
+
+
+class TiledGrid:
+    """A grid of shape (X, Y) stored in square blocks of tile x tile cells, allocated on demand
+
+    Only blocks holding different values are kept as arrays: a block that is all wall, all
+    unreachable or never written is a single value in fills, or the grid fill when absent.
+    With a loader, a block that is neither is built on first read by loader(ti, tj), which
+    stores it with setBlock. Cells are read and written like a 2D array, grid[x, y], with
+    integers or equally shaped index arrays; every cell may itself hold a cellShape array."""
+
+    def __init__(self, shape, dtype=float, fill=0, tile=64, cellShape=(), loader=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+        self.tile = tile
+        self.cellShape = tuple(cellShape)
+        self.loader = loader
+        self.blocks = {}
+        self.fills = {}
+        self.tilesY = -(-self.shape[1] // tile)
+
+    @classmethod
+    def fromDense(cls, a, tile=64, fill=0):
+        """Tiles a 2D array, keeping uniform blocks as a single value"""
+        grid = cls(a.shape, a.dtype, fill, tile)
+        for x0 in range(0, a.shape[0], tile):
+            for y0 in range(0, a.shape[1], tile):
+                grid.setBlock(x0 // tile, y0 // tile, a[x0:x0 + tile, y0:y0 + tile])
+        return grid
+
+    @property
+    def nbytes(self):
+        return sum(block.nbytes for block in self.blocks.values())
+
+    def bounds(self, ti, tj):
+        x0 = ti * self.tile
+        y0 = tj * self.tile
+        return x0, min(x0 + self.tile, self.shape[0]), y0, min(y0 + self.tile, self.shape[1])
+
+    def setBlock(self, ti, tj, values):
+        values = np.asarray(values, dtype=self.dtype)
+        first = values.reshape((-1,) + self.cellShape)[0]
+        key = (ti, tj)
+
+        self.blocks.pop(key, None)
+        self.fills.pop(key, None)
+        if not self.cellShape and (values == first).all():
+            if first != self.fill or self.loader is not None:
+                self.fills[key] = first
+        else:
+            self.blocks[key] = values.copy()
+
+    def getBlock(self, ti, tj):
+        """Returns the array of a block, or its uniform value"""
+        key = (ti, tj)
+        if key not in self.blocks and key not in self.fills and self.loader is not None:
+            self.loader(ti, tj)
+
+        block = self.blocks.get(key)
+        if block is None:
+            return self.fills.get(key, self.fill)
+        return block
+
+    def materialize(self, ti, tj):
+        block = self.getBlock(ti, tj)
+        if not isinstance(block, np.ndarray):
+            x0, x1, y0, y1 = self.bounds(ti, tj)
+            block = np.full((x1 - x0, y1 - y0) + self.cellShape, block, dtype=self.dtype)
+            self.fills.pop((ti, tj), None)
+            self.blocks[(ti, tj)] = block
+        return block
+
+    def index(self, key):
+        x, y = key
+        if np.ndim(x) == 0 and np.ndim(y) == 0:
+            x, y = int(x), int(y)
+            if not (-self.shape[0] <= x < self.shape[0] and -self.shape[1] <= y < self.shape[1]):
+                raise IndexError("index " + str((x, y)) + " is out of bounds for grid of shape " + str(self.shape))
+            return x % self.shape[0], y % self.shape[1]
+
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64))
+        if ((x < -self.shape[0]) | (x >= self.shape[0]) | (y < -self.shape[1]) | (y >= self.shape[1])).any():
+            raise IndexError("index out of bounds for grid of shape " + str(self.shape))
+        return x % self.shape[0], y % self.shape[1]
+
+    def groups(self, x, y):
+        # yields the cells of every block touched by the index arrays x, y
+        blockIDs = (x // self.tile) * self.tilesY + y // self.tile
+        for blockID in np.unique(blockIDs):
+            mask = blockIDs == blockID
+            ti, tj = divmod(int(blockID), self.tilesY)
+            yield ti, tj, mask, x[mask] - ti * self.tile, y[mask] - tj * self.tile
+
+    def __getitem__(self, key):
+        x, y = self.index(key)
+        if isinstance(x, int):
+            block = self.getBlock(x // self.tile, y // self.tile)
+            if isinstance(block, np.ndarray):
+                return block[x % self.tile, y % self.tile]
+            return np.full(self.cellShape, block, dtype=self.dtype)[()]
+
+        out = np.empty(x.shape + self.cellShape, dtype=self.dtype)
+        for ti, tj, mask, bx, by in self.groups(x, y):
+            block = self.getBlock(ti, tj)
+            out[mask] = block[bx, by] if isinstance(block, np.ndarray) else block
+        return out
+
+    def __setitem__(self, key, value):
+        x, y = self.index(key)
+        if isinstance(x, int):
+            self.materialize(x // self.tile, y // self.tile)[x % self.tile, y % self.tile] = value
+            return
+
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), x.shape + self.cellShape)
+        for ti, tj, mask, bx, by in self.groups(x, y):
+            self.materialize(ti, tj)[bx, by] = value[mask]
+
+    def region(self, x0, x1, y0, y1):
+        """Returns the cells [x0:x1, y0:y1] as a dense array; the bounds must lie in the grid"""
+        out = np.empty((x1 - x0, y1 - y0) + self.cellShape, dtype=self.dtype)
+        for ti in range(x0 // self.tile, -(-x1 // self.tile)):
+            for tj in range(y0 // self.tile, -(-y1 // self.tile)):
+                bx0, bx1, by0, by1 = self.bounds(ti, tj)
+                cx0, cx1, cy0, cy1 = max(bx0, x0), min(bx1, x1), max(by0, y0), min(by1, y1)
+                block = self.getBlock(ti, tj)
+                if isinstance(block, np.ndarray):
+                    block = block[cx0 - bx0:cx1 - bx0, cy0 - by0:cy1 - by0]
+                out[cx0 - x0:cx1 - x0, cy0 - y0:cy1 - y0] = block
+        return out
+
+    def toDense(self):
+        return self.region(0, self.shape[0], 0, self.shape[1])
+
+    def __array__(self, dtype=None, copy=None):
+        a = self.toDense()
+        return a if dtype is None else a.astype(dtype)
+
+
+class TiledStack:
+    """Equally shaped TiledGrid layers read like a (layers, X, Y) + cellShape array
+
+    Only gathers are supported: stack[layer, x, y] and, for layers of cells, stack[layer, x, y, i],
+    all with equally shaped index arrays."""
+
+    def __init__(self, layers):
+        self.layers = list(layers)
+        self.shape = (len(self.layers),) + self.layers[0].shape + self.layers[0].cellShape
+
+    def __getitem__(self, key):
+        layer, x, y = np.broadcast_arrays(*[np.asarray(i, dtype=np.int64) for i in key[:3]])
+        item = np.broadcast_to(key[3], layer.shape) if len(key) > 3 else None
+
+        cellShape = self.layers[0].cellShape if item is None else ()
+        out = np.empty(layer.shape + cellShape, dtype=self.layers[0].dtype)
+        for k in np.unique(layer):
+            mask = layer == k
+            values = self.layers[k][x[mask], y[mask]]
+            out[mask] = values if item is None else values[np.arange(len(values)), item[mask]]
+        return out
@@ -0,0 +1,50 @@
+import glob
+import os
+
+import numpy as np
+
+# one row per recorded position: which walker, its step number and the cell it stands on
+TRAJECTORY_DTYPE = np.dtype([('walker', np.int32), ('step', np.int32), ('x', np.int16), ('y', np.int16)])
+
+
+def trajectoryChunk(walker, step, x, y):
+    """Packs equally long columns into a compact trajectory chunk"""
+    chunk = np.empty(len(x), dtype=TRAJECTORY_DTYPE)
+    chunk['walker'] = walker
+    chunk['step'] = step
+    chunk['x'] = x
+    chunk['y'] = y
+    return chunk
+
+
+class NpyChunkWriter:
+    """Trajectory sink appending every chunk it receives as a new .npy file in directory"""
+
+    def __init__(self, directory, prefix='chunk'):
+        self.directory = directory
+        self.prefix = prefix
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, chunk):
+        fileName = self.prefix + '-' + str(self.count).zfill(6) + '.npy'
+        np.save(os.path.join(self.directory, fileName), chunk)
+        self.count += 1
+
+
+def readChunks(directory):
+    """Yields the trajectory chunks stored in directory, memory-mapped, in writing order"""
+    for fileName in sorted(glob.glob(os.path.join(directory, '*.npy'))):
+        yield np.load(fileName, mmap_mode='r')
+
+
+def readPathways(chunks):
+    """Gathers trajectory chunks back into {walker: (steps, 2) array of positions}"""
+    chunks = list(chunks)
+    data = np.concatenate(chunks) if chunks else np.empty(0, dtype=TRAJECTORY_DTYPE)
+    data = data[np.lexsort((data['step'], data['walker']))]
+
+    walkers, first = np.unique(data['walker'], return_index=True)
+    positions = np.stack([data['x'], data['y']], axis=1).astype(np.int64)
+
+    return dict(zip(walkers.tolist(), np.split(positions, first[1:])))
@@ -151,18 +151,18 @@ for ap in attractionPoints:
 # In[24]:
 
 
-for i,idStart in enumerate(points.keys()):
-    for j in range(i+1,len(points)):
-        idEnd = list(points.keys())[j]
-        idPath = idStart + "-" + idEnd
-        BP.calcPath(points[idStart],points[idEnd],idPath)
+# paths are only computed when first asked for, and kept within 256 MB of sniffing maps
+# routes are exact A* ones; BP.pathMode = 'hierarchical' trades exactness for speed on large
+# mazes, unless BP.exactPaths = True
+BP.pathBudget = 256 * 2**20
+
+path = BP.getPath(points['entrata'], points['uscita'], 'entrata-uscita')
 
 
 # In[25]:
 
 
-for key,path in BP.paths.items():
-    plotSniffingMap(BP.maze,path)
+plotSniffingMap(BP.maze,path)
 
 
 # # Walking
@@ -258,7 +258,7 @@ class Walker:
 # In[27]:
 
 
-walker = Walker([BP.paths['entrata-uscita']],'pietro')
+walker = Walker([BP.getPath(points['entrata'], points['uscita'], 'entrata-uscita')],'pietro')
 
 
 # In[28]:
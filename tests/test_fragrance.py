@@ -0,0 +1,28 @@
+import io
+import os
+from contextlib import redirect_stdout
+from xml.dom import minidom
+
+from blueprint import Fragrance, loadSVG
+
+DRAWING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drawing.svg')
+
+
+def test_calcFragranceOfPipelineEntrances():
+    # as mapSVG_pipeline.py reads them: the object of an entrance or exit is its <path> element
+    points = {}
+    for path in minidom.parse(DRAWING).getElementsByTagName('path'):
+        idPath = path.getAttribute('id')
+        if idPath.startswith('entrata') or idPath.startswith('uscita'):
+            points[idPath] = {'object': path, 'cx': float(path.getAttribute('sodipodi:cx')),
+                              'cy': float(path.getAttribute('sodipodi:cy'))}
+    assert points
+
+    with redirect_stdout(io.StringIO()):
+        bp = loadSVG(DRAWING, 7).blueprint
+    for idFrag, point in points.items():
+        bp.calcFragrance(point, idFrag)
+        assert bp.fragrances[idFrag].radius == Fragrance.arrivalRadius
+
+    bp.calcFragrances(points)
+    assert all(bp.fragrances[idFrag].radius == Fragrance.arrivalRadius for idFrag in points)
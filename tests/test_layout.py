@@ -0,0 +1,21 @@
+import io
+import math
+import os
+from contextlib import redirect_stdout
+
+from blueprint import loadSVG
+
+DRAWING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drawing.svg')
+
+
+def test_attractionPointsAt():
+    with redirect_stdout(io.StringIO()):
+        layout = loadSVG(DRAWING, 7)
+    assert layout.index is layout.blueprint.index
+
+    for ap in layout.attractionPoints:
+        for x, y in [(ap.cx, ap.cy), (ap.cx + ap.r, ap.cy), (ap.cx + 2 * ap.r, ap.cy - ap.r)]:
+            assert layout.attractionPointsAt(x, y) == \
+                [p for p in layout.attractionPoints if math.hypot(p.cx - x, p.cy - y) <= p.r]
+            assert layout.attractionPointsAt(x, y, 50) == \
+                [p for p in layout.attractionPoints if math.hypot(p.cx - x, p.cy - y) <= 50]
@@ -0,0 +1,30 @@
+import io
+import os
+from contextlib import redirect_stdout
+
+from blueprint import Walker, loadSVG
+
+DRAWING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drawing.svg')
+
+
+def test_perWalkerSettings():
+    with redirect_stdout(io.StringIO()):
+        layout = loadSVG(DRAWING, 7)
+        points = layout.points()
+        layout.blueprint.calcFragrances(points)
+    ids = list(points)
+    start = layout.blueprint.transformPoint(points[ids[0]]['cx'], points[ids[0]]['cy'])
+    fragrances = [layout.blueprint.fragrances[i] for i in ids[1:3]]
+
+    assigned = Walker(start, fragrances, 'assigned', rng=1)
+    assigned.predictability = 0.4
+    assigned.maxSteps = 5
+    assigned.usePolicy = False
+    passed = Walker(start, fragrances, 'passed', rng=1, predictability=0.4, maxSteps=5, usePolicy=False)
+    with redirect_stdout(io.StringIO()):
+        assigned.startWalking()
+        passed.startWalking()
+
+    assert Walker.maxSteps == 10000 and Walker.usePolicy
+    assert assigned.pathway == passed.pathway
+    assert assigned.cdf == passed.cdf != Walker(start, fragrances, 'default').cdf
@@ -0,0 +1,66 @@
+import io
+import os
+import random
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from blueprint import Blueprint, BlueprintCache, loadSVG
+from blueprint.Blueprint import fragranceStack
+from blueprint.ShopObjects import Wall
+
+DRAWING = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'drawing.svg')
+
+
+def test_updateWallsKeepsUnlistedWalls(tmp_path):
+    # a blueprint loaded from the cache without its walls still has them all in the maze
+    cache = BlueprintCache(str(tmp_path))
+    with redirect_stdout(io.StringIO()):
+        cache.compile(DRAWING, 7, paths=False)
+    bp = cache.compile(DRAWING, 7, paths=False).blueprint
+    assert bp.walls == []
+
+    added = [Wall(bp.x1 + 10, bp.y1 + 10, 8, 8), Wall(bp.x2 - 20, bp.y2 - 20, 8, 8)]
+    with redirect_stdout(io.StringIO()):
+        bp.updateWalls(add=added)
+
+    rebuilt = loadSVG(DRAWING, 7).blueprint
+    rebuilt.defineMaze(added)
+    assert np.array_equal(bp.maze, rebuilt.maze)
+
+
+def test_wallEditsMatchRebuild():
+    # random additions, removals and moves leave the maze, fragrances and paths a full rebuild would give
+    with redirect_stdout(io.StringIO()):
+        layout = loadSVG(DRAWING, 7)
+        bp = layout.blueprint
+        points = layout.points()
+        ids = list(points)
+        pairs = [(points[a], points[b], a + '-' + b) for i, a in enumerate(ids) for b in ids[i + 1:]]
+        bp.calcFragrances(points)
+        bp.calcPaths(pairs)
+
+        rng = random.Random(0)
+        for step in range(8):
+            edit = rng.choice(['add', 'remove', 'move'])
+            if edit == 'add':
+                bp.addWall(Wall(rng.uniform(bp.x1, bp.x2), rng.uniform(bp.y1, bp.y2),
+                                rng.uniform(5, 80), rng.uniform(5, 80)))
+            elif edit == 'remove':
+                bp.removeWall(rng.choice(bp.walls))
+            else:
+                bp.moveWall(rng.choice(bp.walls), rng.uniform(-30, 30), rng.uniform(-30, 30))
+
+            rebuilt = Blueprint(bp.x1, bp.y1, bp.x2, bp.y2)
+            rebuilt.setTranslation(bp.xTranslation, bp.yTranslation)
+            rebuilt.setCellDimension(bp.cellDimension)
+            rebuilt.defineMaze(bp.walls)
+            rebuilt.calcPaths(pairs)
+            assert np.array_equal(bp.maze, rebuilt.maze)
+
+            stack = fragranceStack(rebuilt.maze, [bp.fragrances[k].location for k in ids], dtype=bp.dtypes()[1])
+            for k, idFrag in enumerate(ids):
+                assert np.array_equal(bp.fragrances[idFrag].sniffingMap, stack[k])
+            for idPath, p in bp.paths.items():
+                assert p.path == rebuilt.paths[idPath].path
+                assert np.allclose(p.sniffingMap, rebuilt.paths[idPath].sniffingMap, rtol=0, atol=1e-6)